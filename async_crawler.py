@@ -0,0 +1,227 @@
+import asyncio
+import aiohttp
+import graphql_client
+import query_cache
+import queries
+import batch_queries
+
+# Асинхронный сбор данных: независимые запросы выполняются параллельно,
+# поэтому время обхода определяется самой длинной цепочкой запросов,
+# а не суммой всех запросов
+
+# Максимальное количество одновременных запросов к серверу
+CONCURRENCY = 8
+
+# Сколько клиник или врачей объединять в один запрос (1 - без объединения)
+BATCH_SIZE = batch_queries.BATCH_SIZE
+
+
+def new_data():
+    return {
+        "doctor_types": [],
+        "doctors": [],
+        "customers": [],
+        "clinics": [],
+        "clinic_offices": {},
+        "clinic_doctors": {},
+        "doctor_schedules": {},
+        "appointments": {}
+    }
+
+
+class AsyncGraphQLClient:
+    """
+    Асинхронный клиент GraphQL с ограничением числа одновременных запросов,
+    повторные запросы берутся из кэша cache (None - всегда запрашивает сервер)
+    """
+
+    def __init__(self, session, concurrency=CONCURRENCY, on_error=print, cache=None):
+        self.session = session
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.on_error = on_error
+        self.cache = cache
+
+    async def query(self, query, variables=None, partial=False):
+        if self.cache is not None:
+            cached = self.cache.get(query, variables)
+            if cached is not None:
+                return cached
+
+        async with self.semaphore:
+            try:
+                json_data = {
+                    'query': query,
+                    'variables': variables or {}
+                }
+
+                async with self.session.post(graphql_client.url, json=json_data) as response:
+                    if response.status == 200:
+                        result = await response.json(content_type=None)
+                        if 'errors' in result:
+                            self.on_error(f"GraphQL Errors: {result['errors']}")
+                            return graphql_client.partial_data(result, partial)
+                        return graphql_client.store_result(query, variables, result.get('data'), self.cache)
+                    else:
+                        self.on_error(f"HTTP Error {response.status}: {await response.text()}")
+                        return None
+
+            except Exception as e:
+                self.on_error(f"Exception occurred: {str(e)}")
+                return None
+
+
+def create_session(concurrency=CONCURRENCY):
+    """
+    Создает aiohttp сессию с пулом keep-alive соединений и таймаутами по умолчанию
+    """
+    connect_timeout, read_timeout = graphql_client.DEFAULT_TIMEOUT
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency, keepalive_timeout=graphql_client.KEEPALIVE_INTERVAL)
+    timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def clinic_schedules(doctors, availability):
+    """
+    Раскладывает расписание клиники по ее врачам: [(clinic_doctor_id, строки)]
+    """
+    if doctors is None or availability is None:
+        return []
+    doctor_ids = [doctor.get('id') for doctor in doctors if doctor.get('id')]
+    schedules = queries.group_availability(availability, doctor_ids)
+    return [(doctor_id, schedules[doctor_id]) for doctor_id in doctor_ids]
+
+
+async def collect_clinic_data(client, clinic_id, date_from=None, date_to=None):
+    """
+    Собирает кабинеты, врачей с расписанием и записи одной клиники.
+    Расписание запрашивается сразу для всей клиники, поэтому все четыре запроса независимы
+    """
+    offices_result, doctors_result, availability_result, appointments_result = await asyncio.gather(
+        client.query(*queries.clinic_offices_query(clinic_id)),
+        client.query(*queries.clinic_doctors_query(clinic_id)),
+        client.query(*queries.clinic_availability_query(clinic_id, date_from, date_to)),
+        client.query(*queries.clinic_tables_query(clinic_id, *queries.appointments_horizon())),
+    )
+    doctors = queries.extract_elems(doctors_result, 'searchClinicDoctor')
+    availability = queries.extract_elems(availability_result, 'searchClinicDoctorAvailability')
+    return {
+        'offices': queries.extract_elems(offices_result, 'searchClinicOffice'),
+        'doctors': doctors,
+        'schedules': clinic_schedules(doctors, availability),
+        'appointments': queries.extract_elems(appointments_result, 'searchClinicTable'),
+    }
+
+
+async def run_batches(client, build_query, keys, batch_size):
+    """
+    Выполняет пакетные запросы параллельно и объединяет результаты по идентификаторам.
+    Ключи, по которым пакет не вернул данных, запрашиваются повторно по одному
+    """
+    key_chunks = list(batch_queries.chunks(keys, batch_size))
+    batches = [build_query(chunk) for chunk in key_chunks]
+    results = await asyncio.gather(*(client.query(query, variables, partial=True) for query, variables, _ in batches))
+
+    merged = {}
+    for (_, _, aliases), result in zip(batches, results):
+        merged.update(batch_queries.split_batch(result, aliases))
+
+    retries = [build_query([key]) for chunk in key_chunks for key in batch_queries.failed_keys(merged, chunk)]
+    results = await asyncio.gather(*(client.query(query, variables) for query, variables, _ in retries))
+    for (_, _, aliases), result in zip(retries, results):
+        merged.update(batch_queries.split_batch(result, aliases))
+    return merged
+
+
+async def collect_clinics_batched(client, clinic_ids, batch_size, date_from=None, date_to=None):
+    """
+    То же, что collect_clinic_data для всех клиник сразу, но пакетными запросами
+    """
+    date_from, date_to = queries.default_date_range(date_from, date_to)
+
+    offices, doctors, availability, appointments = await asyncio.gather(
+        run_batches(client, batch_queries.clinic_offices_batch_query, clinic_ids, batch_size),
+        run_batches(client, batch_queries.clinic_doctors_batch_query, clinic_ids, batch_size),
+        run_batches(
+            client,
+            lambda chunk: batch_queries.clinic_availability_batch_query(chunk, date_from, date_to),
+            clinic_ids,
+            batch_size,
+        ),
+        run_batches(
+            client,
+            lambda chunk: batch_queries.clinic_tables_batch_query(chunk, *queries.appointments_horizon()),
+            clinic_ids,
+            batch_size,
+        ),
+    )
+
+    return [
+        {
+            'offices': offices.get(clinic_id),
+            'doctors': doctors.get(clinic_id),
+            'schedules': clinic_schedules(doctors.get(clinic_id), availability.get(clinic_id)),
+            'appointments': appointments.get(clinic_id),
+        }
+        for clinic_id in clinic_ids
+    ]
+
+
+async def collect_all_data_async(concurrency=CONCURRENCY, on_error=print, batch_size=BATCH_SIZE):
+    """
+    Полный обход сервера: типы врачей, врачи, клиенты, клиники и данные каждой клиники.
+    У каждого обхода свой кэш ответов: один запрос не уходит на сервер дважды за обход,
+    а следующий обход получает свежие данные
+    """
+    data = new_data()
+
+    async with create_session(concurrency) as session:
+        client = AsyncGraphQLClient(session, concurrency, on_error, query_cache.QueryCache())
+
+        doctor_types, doctors, customers, clinics = await asyncio.gather(
+            client.query(*queries.doctor_types_query()),
+            client.query(*queries.doctors_query()),
+            client.query(*queries.customers_query()),
+            client.query(*queries.clinics_query()),
+        )
+
+        for key, result, field in (("doctor_types", doctor_types, 'searchDoctorType'),
+                                   ("doctors", doctors, 'searchDoctor'),
+                                   ("customers", customers, 'searchCustomer')):
+            elems = queries.extract_elems(result, field)
+            if elems is not None:
+                data[key] = elems
+
+        clinics = queries.extract_elems(clinics, 'searchClinic')
+        if clinics is None:
+            return data
+        data["clinics"] = clinics
+
+        clinic_ids = [clinic.get('id') for clinic in clinics if clinic.get('id')]
+        date_from, date_to = queries.default_date_range()
+        if batch_size and batch_size > 1:
+            clinic_results = await collect_clinics_batched(client, clinic_ids, batch_size, date_from, date_to)
+        else:
+            clinic_results = await asyncio.gather(
+                *(collect_clinic_data(client, clinic_id, date_from, date_to) for clinic_id in clinic_ids)
+            )
+
+    # Раскладываем результаты в том же порядке, что и синхронный обход
+    for clinic_id, clinic_data in zip(clinic_ids, clinic_results):
+        if clinic_data['offices'] is not None:
+            data["clinic_offices"][clinic_id] = clinic_data['offices']
+        if clinic_data['doctors'] is not None:
+            data["clinic_doctors"][clinic_id] = clinic_data['doctors']
+            for clinic_doctor_id, schedule in clinic_data['schedules']:
+                if schedule is not None:
+                    data["doctor_schedules"][clinic_doctor_id] = schedule
+        if clinic_data['appointments'] is not None:
+            data["appointments"][clinic_id] = clinic_data['appointments']
+
+    return data
+
+
+def collect_all_data(concurrency=CONCURRENCY, on_error=print, batch_size=BATCH_SIZE):
+    """
+    Запускает асинхронный сбор данных из синхронного кода
+    """
+    return asyncio.run(collect_all_data_async(concurrency, on_error, batch_size))
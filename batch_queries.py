@@ -0,0 +1,141 @@
+import graphql_client
+import queries
+
+# Пакетные запросы: вместо отдельного запроса на каждую клинику или врача
+# несколько поисков объединяются в один GraphQL документ через алиасы полей
+# (c0: searchClinicOffice(...), c1: searchClinicOffice(...), ...),
+# а ответ затем раскладывается обратно по идентификаторам
+
+# Сколько клиник или врачей объединять в один запрос
+BATCH_SIZE = 25
+
+
+def chunks(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def clinic_batch_query(field, selection, clinic_ids):
+    """
+    Собирает запрос field по нескольким клиникам, возвращает (query, variables, aliases)
+    """
+    aliases = {}
+    parts = []
+    for i, clinic_id in enumerate(clinic_ids):
+        alias = f"c{i}"
+        aliases[alias] = clinic_id
+        parts.append(f"""
+      {alias}: {field}(cond: "it.clinic.id == '{clinic_id}'") {selection}""")
+
+    query = "query {%s\n    }" % "".join(parts)
+    return query, None, aliases
+
+
+def clinic_offices_batch_query(clinic_ids):
+    return clinic_batch_query('searchClinicOffice', queries.CLINIC_OFFICE_SELECTION, clinic_ids)
+
+
+def clinic_doctors_batch_query(clinic_ids):
+    return clinic_batch_query('searchClinicDoctor', queries.CLINIC_DOCTOR_SELECTION, clinic_ids)
+
+
+def clinic_tables_batch_query(clinic_ids, date_from=None, date_to=None, fields=queries.CLINIC_TABLE_SELECTION,
+                              since_id=None):
+    """
+    Собирает запрос записей нескольких клиник, условия те же, что в clinic_tables_query
+    """
+    cond, params, variables = queries.date_window_cond(date_from, date_to)
+    if since_id is not None:
+        cond += f" && it.id > '{since_id}'"
+    directive = ""
+    if variables:
+        directive = " @strExpr(dateTimes:[%s])" % ", ".join("$" + name for name in variables)
+
+    aliases = {}
+    parts = []
+    for i, clinic_id in enumerate(clinic_ids):
+        alias = f"c{i}"
+        aliases[alias] = clinic_id
+        parts.append(f"""
+      {alias}: searchClinicTable(cond: "it.clinic.id == '{clinic_id}'{cond}"){directive} {fields}""")
+
+    if variables:
+        query = "query batchClinicTable(%s) {%s\n    }" % (", ".join(params), "".join(parts))
+        return query, variables, aliases
+    return "query {%s\n    }" % "".join(parts), None, aliases
+
+
+def clinic_availability_batch_query(clinic_ids, date_from=None, date_to=None):
+    """
+    Собирает запрос расписаний всех врачей нескольких клиник за один период
+    """
+    date_from, date_to = queries.default_date_range(date_from, date_to)
+
+    aliases = {}
+    parts = []
+    for i, clinic_id in enumerate(clinic_ids):
+        alias = f"c{i}"
+        aliases[alias] = clinic_id
+        parts.append(f"""
+        {alias}: searchClinicDoctorAvailability(
+            cond: "it.clinicDoctor.clinic.id == '{clinic_id}' && it.endDate >= ${{dateFrom}} && it.beginDate <= ${{dateTo}}"
+        ) @strExpr(dateTimes:[$dateFrom, $dateTo]) {queries.CLINIC_AVAILABILITY_SELECTION}""")
+
+    variables = {
+        "dateFrom": date_from.isoformat(),
+        "dateTo": date_to.isoformat()
+    }
+    query = "query batchClinicAvailability($dateFrom: _DateTime!, $dateTo: _DateTime!) {%s\n    }" % "".join(parts)
+    return query, variables, aliases
+
+
+def split_batch(result, aliases):
+    """
+    Раскладывает ответ пакетного запроса по идентификаторам: {id: elems или None}
+    """
+    return {key: queries.extract_elems(result, alias) for alias, key in aliases.items()}
+
+
+def failed_keys(results, chunk):
+    """
+    Ключи пакета из нескольких элементов, по которым нет данных (ошибка в алиасе или во всем запросе)
+    """
+    if len(chunk) < 2:
+        return []
+    return [key for key in chunk if results.get(key) is None]
+
+
+def run_batched(build_query, keys, batch_size=BATCH_SIZE, run=graphql_client.graphql_query):
+    """
+    Выполняет пакетные запросы по частям размером batch_size и объединяет результаты.
+    Из частичного ответа берутся удавшиеся алиасы, остальные ключи запрашиваются по одному
+    """
+    results = {}
+    for chunk in chunks(list(keys), batch_size):
+        query, variables, aliases = build_query(chunk)
+        results.update(split_batch(run(query, variables, partial=True), aliases))
+        for key in failed_keys(results, chunk):
+            query, variables, aliases = build_query([key])
+            results.update(split_batch(run(query, variables), aliases))
+    return results
+
+
+def get_clinic_offices_batch(clinic_ids, batch_size=BATCH_SIZE, run=graphql_client.graphql_query):
+    return run_batched(clinic_offices_batch_query, clinic_ids, batch_size, run)
+
+
+def get_clinic_doctors_batch(clinic_ids, batch_size=BATCH_SIZE, run=graphql_client.graphql_query):
+    return run_batched(clinic_doctors_batch_query, clinic_ids, batch_size, run)
+
+
+def get_clinic_tables_batch(clinic_ids, date_from=None, date_to=None, fields=queries.CLINIC_TABLE_SELECTION,
+                            since_id=None, batch_size=BATCH_SIZE, run=graphql_client.graphql_query):
+    return run_batched(lambda chunk: clinic_tables_batch_query(chunk, date_from, date_to, fields, since_id),
+                       clinic_ids, batch_size, run)
+
+
+def get_clinic_availability_batch(clinic_ids, date_from=None, date_to=None, batch_size=BATCH_SIZE,
+                                  run=graphql_client.graphql_query):
+    date_from, date_to = queries.default_date_range(date_from, date_to)
+    return run_batched(lambda chunk: clinic_availability_batch_query(chunk, date_from, date_to),
+                       clinic_ids, batch_size, run)
@@ -0,0 +1,16 @@
+# Потоковая выдача ответа языковой модели по частям (токенам) для окна Tkinter
+# (chat_worker.ChatWorker.submit_stream): пользователь видит начало ответа сразу,
+# не дожидаясь его окончания
+
+
+def stream_reply(chat, messages):
+    """
+    Части текста ответа по мере генерации; модель без потокового режима отдает ответ одной частью
+    """
+    stream = getattr(chat, 'stream', None)
+    if stream is None:
+        yield chat(messages).content
+        return
+    for chunk in stream(messages):
+        if chunk.content:
+            yield chunk.content
@@ -0,0 +1,101 @@
+import queue
+import threading
+from chat_stream import stream_reply
+
+# Запросы к языковой модели в отдельном потоке, чтобы окно Tkinter не зависало на время ответа.
+# Интерфейс отправляет запрос через submit(), рабочий поток вызывает модель и кладет результат
+# в очередь, а poll(), запущенный через root.after, забирает результаты в потоке Tk и вызывает
+# обработчики. Каждый новый запрос вытесняет предыдущие: еще не начатые не выполняются,
+# а ответы на уже отправленные отбрасываются. В потоковом режиме (submit_stream) части ответа
+# передаются в интерфейс по мере генерации, а вытесненный запрос перестает читать поток модели
+
+# Период опроса очереди результатов, в миллисекундах
+POLL_INTERVAL = 50
+
+
+class ChatWorker:
+    def __init__(self, chat, on_error=print):
+        # chat(messages) -> ответ модели
+        self.chat = chat
+        self.on_error = on_error
+        self.latest = 0
+        self._lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="chat-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, messages, on_result, on_failure=None):
+        """
+        Ставит запрос в очередь и возвращает его номер; обработчики вызываются в потоке Tk
+        """
+        return self._submit(messages, False, (on_result, None, on_failure))
+
+    def submit_stream(self, messages, on_chunk, on_done, on_failure=None):
+        """
+        Потоковый запрос: on_chunk(text) на каждую часть ответа, on_done(full_text) в конце
+        """
+        return self._submit(messages, True, (on_done, on_chunk, on_failure))
+
+    def _submit(self, messages, stream, handlers):
+        with self._lock:
+            self.latest += 1
+            request_id = self.latest
+        self._requests.put((request_id, list(messages), stream, handlers))
+        return request_id
+
+    def cancel(self):
+        """
+        Отменяет все отправленные запросы: их ответы не будут обработаны
+        """
+        with self._lock:
+            self.latest += 1
+
+    def is_current(self, request_id):
+        return request_id == self.latest
+
+    def _run(self):
+        while True:
+            request_id, messages, stream, handlers = self._requests.get()
+            if not self.is_current(request_id):
+                continue
+            try:
+                if stream:
+                    parts = []
+                    chunks = stream_reply(self.chat, messages)
+                    for chunk in chunks:
+                        if not self.is_current(request_id):
+                            chunks.close()
+                            break
+                        parts.append(chunk)
+                        self._results.put((request_id, "chunk", chunk, handlers))
+                    result = "".join(parts)
+                else:
+                    result = self.chat(messages)
+                self._results.put((request_id, "result", result, handlers))
+            except Exception as e:
+                self._results.put((request_id, "error", e, handlers))
+
+    def poll(self, root, interval=POLL_INTERVAL):
+        """
+        Обрабатывает готовые ответы в потоке Tk и планирует следующий опрос
+        """
+        while True:
+            try:
+                request_id, kind, value, (on_result, on_chunk, on_failure) = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not self.is_current(request_id):
+                continue
+            try:
+                if kind == "chunk":
+                    on_chunk(value)
+                elif kind == "result":
+                    on_result(value)
+                elif on_failure is not None:
+                    on_failure(value)
+                else:
+                    self.on_error(f"Chat request failed: {str(value)}")
+            except Exception as e:
+                self.on_error(f"Chat callback failed: {str(e)}")
+        root.after(interval, self.poll, root, interval)
@@ -0,0 +1,94 @@
+import threading
+from langchain.schema import HumanMessage, SystemMessage
+from prompt_context import estimate_tokens
+
+# Ограниченная память разговора с ассистентом. В модель уходят системное сообщение,
+# краткое содержание прошлого разговора и скользящее окно последних реплик.
+# Реплики, вышедшие из окна (по количеству или по бюджету токенов), сворачиваются
+# в краткое содержание, которое тоже ограничено по размеру. Данные форм (регистрация)
+# в память не попадают - вместо них можно записать короткую заметку через add_note()
+
+# Бюджет токенов на краткое содержание и окно реплик
+MEMORY_TOKENS = 2000
+# Сколько последних реплик держать целиком
+WINDOW_MESSAGES = 12
+# Бюджет токенов на краткое содержание
+SUMMARY_TOKENS = 300
+# Сколько символов реплики остается в кратком содержании
+SUMMARY_LINE_CHARS = 150
+
+
+def message_line(message):
+    role = "Пациент" if isinstance(message, HumanMessage) else "Ассистент"
+    text = " ".join(message.content.split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS] + "..."
+    return f"{role}: {text}"
+
+
+def trim_lines(lines, max_tokens):
+    # Самые старые строки уходят первыми
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return lines
+
+
+def extractive_summary(summary, messages, max_tokens=SUMMARY_TOKENS):
+    """
+    Краткое содержание без обращения к модели: укороченные реплики, старые вытесняются новыми
+    """
+    lines = summary.split("\n") if summary else []
+    lines.extend(message_line(message) for message in messages)
+    return "\n".join(trim_lines(lines, max_tokens))
+
+
+class ConversationMemory:
+    def __init__(self, system, max_tokens=MEMORY_TOKENS, window=WINDOW_MESSAGES, summary_tokens=SUMMARY_TOKENS,
+                 summarize=extractive_summary):
+        # summarize(summary, messages, max_tokens) -> новое краткое содержание
+        self.system = system
+        self.max_tokens = max_tokens
+        self.window = window
+        self.summary_tokens = summary_tokens
+        self.summarize = summarize
+        self.summary = ""
+        self.turns = []
+        self._lock = threading.Lock()
+
+    def set_system(self, message):
+        self.system = message
+
+    def add(self, message):
+        with self._lock:
+            self.turns.append(message)
+            self._compact()
+
+    def add_note(self, text):
+        """
+        Заметка о событии вне разговора (например, о регистрации) без самих данных
+        """
+        with self._lock:
+            lines = (self.summary.split("\n") if self.summary else []) + [text]
+            self.summary = "\n".join(trim_lines(lines, self.summary_tokens))
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(message.content) for message in self.turns)
+
+    def _compact(self):
+        # Последнюю реплику оставляем всегда, даже если она одна больше бюджета
+        while len(self.turns) > 1 and (len(self.turns) > self.window or self.tokens() > self.max_tokens):
+            dropped = [self.turns.pop(0)]
+            # Вопрос пациента сворачиваем вместе с ответом ассистента
+            if len(self.turns) > 1 and not isinstance(self.turns[0], HumanMessage):
+                dropped.append(self.turns.pop(0))
+            self.summary = self.summarize(self.summary, dropped, self.summary_tokens)
+
+    def messages(self):
+        """
+        Сообщения для вызова модели
+        """
+        with self._lock:
+            messages = [self.system]
+            if self.summary:
+                messages.append(SystemMessage(content="Краткое содержание предыдущего разговора:\n" + self.summary))
+            return messages + list(self.turns)
@@ -0,0 +1,189 @@
+import os
+from datetime import datetime
+import graphql_client
+import query_cache
+import snapshot_format
+import queries
+import batch_queries
+import async_crawler
+from doctors_model import id_key
+
+# Инкрементальное обновление results.json: вместо полного обхода загружаем прошлый снимок
+# и запрашиваем у сервера только то, что могло измениться с прошлой синхронизации:
+# - новых клиентов и новые записи по водяному знаку идентификатора (it.id > последний id);
+# - свободные окна врачей за текущий период (они меняются чаще всего);
+# - небольшие справочники (типы врачей, врачи, клиники, кабинеты, врачи клиник) целиком.
+# Кэш ответов живет одну синхронизацию: повторный запрос внутри нее не уходит на сервер,
+# а следующая синхронизация запрашивает справочники заново.
+# Идентификаторы сервера монотонно растут, поэтому сравнение it.id > id выбирает новые сущности
+
+SNAPSHOT_FILE = "results.json"
+
+
+def load_snapshot(filename=SNAPSHOT_FILE):
+    """
+    Загружает прошлый снимок или возвращает None, если его нет или он поврежден
+    """
+    if not os.path.exists(filename):
+        return None
+    try:
+        return snapshot_format.load(filename)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def max_id(items):
+    ids = [item['id'] for item in items if item.get('id')]
+    return max(ids, key=id_key) if ids else None
+
+
+def merge_by_id(old_items, new_items):
+    """
+    Объединяет списки сущностей по id, новые версии заменяют старые, порядок сохраняется
+    """
+    merged = {item.get('id'): item for item in old_items}
+    for item in new_items:
+        merged[item.get('id')] = item
+    return list(merged.values())
+
+
+def is_active(appointment, horizon_start):
+    end_date = appointment.get('endDate')
+    return not end_date or datetime.fromisoformat(end_date) >= horizon_start
+
+
+def advance(state, key, items):
+    """
+    Сдвигает водяной знак key вперед до наибольшего id из items; назад он не откатывается
+    """
+    value = max_id(items)
+    if value is not None and (state.get(key) is None or id_key(value) > id_key(state[key])):
+        state[key] = value
+
+
+def sync_state(data):
+    """
+    Водяные знаки снимка: последний известный клиент и последняя известная запись.
+    Сохраненные в снимке значения не пересчитываются, по сущностям снимка
+    считаются только отсутствующие (снимок старого формата или полный обход)
+    """
+    state = dict(data.get("sync") or {})
+    if state.get("customers_watermark") is None:
+        advance(state, "customers_watermark", data.get("customers", []))
+    if state.get("appointments_watermark") is None:
+        advance(state, "appointments_watermark", [
+            appointment
+            for appointments in data.get("appointments", {}).values()
+            for appointment in appointments
+        ])
+    return state
+
+
+def stamp(data):
+    data["sync"] = sync_state(data)
+    data["sync"]["synced_at"] = datetime.now().isoformat()
+    return data
+
+
+def refresh_list(data, key, query, field, run):
+    elems = queries.extract_elems(run(*query), field)
+    if elems is not None:
+        data[key] = elems
+
+
+def delta_sync(previous, run=graphql_client.graphql_query):
+    """
+    Дополняет прошлый снимок изменениями с сервера и возвращает новый снимок
+    """
+    data = dict(previous)
+    state = sync_state(previous)
+
+    refresh_list(data, "doctor_types", queries.doctor_types_query(), 'searchDoctorType', run)
+    refresh_list(data, "doctors", queries.doctors_query(), 'searchDoctor', run)
+    refresh_list(data, "clinics", queries.clinics_query(), 'searchClinic', run)
+
+    # Новые клиенты
+    new_customers = queries.extract_elems(run(*queries.customers_query(state.get("customers_watermark"))),
+                                          'searchCustomer')
+    if new_customers:
+        data["customers"] = merge_by_id(previous.get("customers", []), new_customers)
+
+    clinic_ids = [clinic.get('id') for clinic in data["clinics"] if clinic.get('id')]
+    date_from, date_to = queries.default_date_range()
+    horizon_start, horizon_end = queries.appointments_horizon()
+
+    offices = batch_queries.get_clinic_offices_batch(clinic_ids, run=run)
+    doctors = batch_queries.get_clinic_doctors_batch(clinic_ids, run=run)
+    availability = batch_queries.get_clinic_availability_batch(clinic_ids, date_from, date_to, run=run)
+    new_appointments = batch_queries.get_clinic_tables_batch(
+        clinic_ids, horizon_start, horizon_end, since_id=state.get("appointments_watermark"), run=run)
+
+    previous_offices = previous.get("clinic_offices", {})
+    previous_doctors = previous.get("clinic_doctors", {})
+    previous_schedules = previous.get("doctor_schedules", {})
+    previous_appointments = previous.get("appointments", {})
+    data["clinic_offices"] = {}
+    data["clinic_doctors"] = {}
+    data["doctor_schedules"] = {}
+    data["appointments"] = {}
+
+    for clinic_id in clinic_ids:
+        # Если запрос по клинике не удался, оставляем данные прошлого снимка
+        clinic_offices = offices.get(clinic_id)
+        if clinic_offices is None:
+            clinic_offices = previous_offices.get(clinic_id)
+        if clinic_offices is not None:
+            data["clinic_offices"][clinic_id] = clinic_offices
+
+        clinic_doctors = doctors.get(clinic_id)
+        if clinic_doctors is None:
+            clinic_doctors = previous_doctors.get(clinic_id)
+        if clinic_doctors is None:
+            continue
+        data["clinic_doctors"][clinic_id] = clinic_doctors
+
+        # Свободные окна за период заменяют прошлые целиком
+        if availability.get(clinic_id) is not None:
+            for clinic_doctor_id, schedule in async_crawler.clinic_schedules(clinic_doctors, availability[clinic_id]):
+                data["doctor_schedules"][clinic_doctor_id] = schedule
+        else:
+            for clinic_doctor in clinic_doctors:
+                if clinic_doctor.get('id') in previous_schedules:
+                    data["doctor_schedules"][clinic_doctor['id']] = previous_schedules[clinic_doctor['id']]
+
+    for clinic_id in clinic_ids:
+        if new_appointments.get(clinic_id) is None and clinic_id not in previous_appointments:
+            continue
+        # Прошлые записи без уже завершенных плюс новые записи
+        appointments = [
+            appointment
+            for appointment in previous_appointments.get(clinic_id, [])
+            if is_active(appointment, horizon_start)
+        ]
+        data["appointments"][clinic_id] = merge_by_id(appointments, new_appointments.get(clinic_id) or [])
+
+    # Водяные знаки сдвигаем только по полученным с сервера сущностям. Знак записей общий для всех
+    # клиник: если записи хоть одной клиники не получены, новые id других клиник скрыли бы
+    # пропущенные записи этой клиники, поэтому знак остается прежним до следующей синхронизации
+    advance(state, "customers_watermark", new_customers or [])
+    if all(new_appointments.get(clinic_id) is not None for clinic_id in clinic_ids):
+        advance(state, "appointments_watermark", [
+            appointment
+            for appointments in new_appointments.values()
+            for appointment in appointments
+        ])
+    data["sync"] = state
+    return stamp(data)
+
+
+def sync_data(filename=SNAPSHOT_FILE, on_error=print):
+    """
+    Возвращает актуальный снимок: инкрементально, если есть прошлый, иначе полным обходом
+    """
+    previous = load_snapshot(filename)
+    if previous is None:
+        return stamp(async_crawler.collect_all_data(on_error=on_error))
+
+    cache = query_cache.QueryCache()
+    return delta_sync(previous, run=lambda query, variables=None, partial=False: graphql_client.graphql_query(
+        query, variables, on_error=on_error, cache=cache, partial=partial))
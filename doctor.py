@@ -1,39 +1,17 @@
-import requests
-import json
+from graphql_client import graphql_query
+from doctors_model import clinic_doctor_name
+import sqlite_store
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 
-# URL GraphQL server
-url = "https://smapi.pv-api.sbc.space/ds-7429590172239724545/graphql"
+# Источник данных для записи: снимок results.json или база SQLite (results.db).
+# None - более свежий из базы и снимка; можно задать переменной окружения DOCTORS_DATA_FILE
+DATA_FILE = None
 
-def graphql_query(query, variables=None):
-    # Function to execute GraphQL queries
-    try:
-        json_data = {
-            'query': query,
-            'variables': variables or {}
-        }
-
-        response = requests.post(url, json=json_data)
 
-        if response.status_code == 200:
-            result = response.json()
-            if 'errors' in result:
-                print(f"GraphQL Errors: {result['errors']}")
-                return None
-            return result.get('data')
-        else:
-            print(f"HTTP Error {response.status_code}: {response.text}")
-            return None
-
-    except Exception as e:
-        print(f"Exception occurred: {str(e)}")
-        return None
-
-def load_data():
-    # Load data from JSON file
-    with open('results.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
+def load_model():
+    # SQLite отдает только нужные строки по индексам, JSON разбирается целиком
+    return sqlite_store.open_model(DATA_FILE)
 
 def create_appointment(clinic_id, clinic_doctor_id, begin_date, end_date, clinic_office_id, customer_id):
     mutation = """
@@ -78,16 +56,11 @@ def create_appointment(clinic_id, clinic_doctor_id, begin_date, end_date, clinic
         print("Failed to create appointment")
         return None
 
-def start():
-    data = load_data()
-    clinics = data['clinics']
-    clinic_offices = data['clinic_offices']
-    clinic_doctors = data['clinic_doctors']
-    customers = data['customers']
-
-    # Create a mapping of clinic numbers to IDs
-    clinic_mapping = {str(i + 1): clinic['id'] for i, clinic in enumerate(clinics)}
-    customer_mapping = {customer['insurancePolicyNumber']: customer['id'] for customer in customers}
+def start(model=None):
+    # model - готовая модель (например, SnapshotRefresher.model()), иначе читаем DATA_FILE
+    if model is None:
+        model = load_model()
+    clinics = model.clinics
 
     # Input clinic number instead of ID
     clinic_number = simpledialog.askstring("Выбор клиники",
@@ -95,45 +68,43 @@ def start():
                                                [f"{i + 1}: {clinic['name']}" for i, clinic in enumerate(clinics)]))
 
     # Validate input and get the corresponding clinic ID
-    clinic_id = clinic_mapping.get(clinic_number)
-    if not clinic_id:
+    clinic = model.clinic_at(clinic_number)
+    if not clinic:
         messagebox.showerror("Ошибка", "Некорректный номер клиники.")
         return
+    clinic_id = clinic['id']
 
     # Proceed with selecting office
-    offices = clinic_offices.get(clinic_id, [])
+    offices = model.offices(clinic_id)
     if not offices:
         messagebox.showerror("Ошибка", "Нет доступных кабинетов в выбранной клинике.")
         return
 
-    # Create a mapping of office numbers to IDs
-    office_mapping = {office['officeNumber']: office['id'] for office in offices}
-
     # Input office number instead of ID
     office_number = simpledialog.askstring("Выбор кабинета", "Введите номер кабинета:\n" + "\n".join(
         [f"{office['officeNumber']}" for office in offices]))
 
     # Validate input and get the corresponding office ID
-    office_id = office_mapping.get(office_number)
-    if not office_id:
+    office = model.office(clinic_id, office_number)
+    if not office:
         messagebox.showerror("Ошибка", "Некорректный номер кабинета.")
         return
+    office_id = office['id']
 
     # Selecting doctor by specialty
-    specialties = list(set(doctor['doctor']['entity']['doctorType']['name'] for doctor in clinic_doctors.get(clinic_id, [])))
+    specialties = model.specialties(clinic_id)
     specialty_selection = simpledialog.askstring("Выбор специальности", "Выберите специальность врача по номеру:\n" + "\n".join(
         [f"{i + 1}: {specialty}" for i, specialty in enumerate(specialties)]))
 
     # Validate the specialty selection
-    if specialty_selection.isdigit() and 1 <= int(specialty_selection) <= len(specialties):
+    if specialty_selection and specialty_selection.isdigit() and 1 <= int(specialty_selection) <= len(specialties):
         specialty = specialties[int(specialty_selection) - 1]
     else:
         messagebox.showerror("Ошибка", "Некорректный выбор специальности.")
         return
 
     # Find matching doctors by specialty
-    doctors = [doctor for doctor in clinic_doctors.get(clinic_id, []) if
-               doctor['doctor']['entity']['doctorType']['name'] == specialty]
+    doctors = model.doctors_with_specialty(clinic_id, specialty)
 
     if not doctors:
         messagebox.showerror("Ошибка", "Нет доступных врачей с указанной специальностью.")
@@ -141,12 +112,10 @@ def start():
 
     # Display matching doctors
     doctor_selection = simpledialog.askstring("Выбор врача", "Выберите врача по номеру:\n" + "\n".join(
-        [
-            f"{i + 1}: {doctor['doctor']['entity']['person']['entity']['firstName']} {doctor['doctor']['entity']['person']['entity']['lastName']}"
-            for i, doctor in enumerate(doctors)]))
+        [f"{i + 1}: {' '.join(clinic_doctor_name(doctor))}" for i, doctor in enumerate(doctors)]))
 
     # Validate the doctor's selection
-    if doctor_selection.isdigit() and 1 <= int(doctor_selection) <= len(doctors):
+    if doctor_selection and doctor_selection.isdigit() and 1 <= int(doctor_selection) <= len(doctors):
         doctor_id = doctors[int(doctor_selection) - 1]['id']  # Получаем ID врача
     else:
         messagebox.showerror("Ошибка", "Некорректный выбор врача.")
@@ -160,10 +129,11 @@ def start():
     insurance_policy_number = simpledialog.askstring("Медицинский полис", "Введите номер медицинского полиса:")
 
     # Проверяем, существует ли клиент с таким номером полиса
-    customer_id = customer_mapping.get(insurance_policy_number)
-    if not customer_id:
+    customer = model.customer(insurance_policy_number)
+    if not customer:
         messagebox.showerror("Ошибка", "Некорректный номер медицинского полиса.")
         return
+    customer_id = customer['id']
 
     # Create appointment
     appointment_result = create_appointment(clinic_id, doctor_id, begin_date, end_date, office_id, customer_id)
@@ -0,0 +1,152 @@
+import math
+import re
+import threading
+from collections import Counter
+from doctors_model import get_model, clinic_doctor_name
+import prompt_context
+
+# Локальный поиск специальностей по симптомам без обращения к сети: индекс BM25 по типам
+# врачей (название и описание), врачам клиник и небольшому словарю симптомов для частых
+# специальностей. Ассистент получает на каждый ход только k самых подходящих специальностей
+# с врачами и ближайшими окнами, поэтому размер подсказки не растет вместе с каталогом.
+# Индекс строится один раз на снимок
+
+# Сколько специальностей подставлять в подсказку
+TOP_K = 3
+# Бюджет токенов на найденный контекст
+SEARCH_CONTEXT_TOKENS = 500
+
+# Параметры BM25
+K1 = 1.5
+B = 0.75
+
+# Симптомы, по которым ищутся специальности, если их нет в описании типа врача.
+# Ключ - начало названия специальности в нижнем регистре
+SYMPTOM_HINTS = {
+    "терапевт": "температура простуда кашель насморк слабость головная боль горло давление недомогание",
+    "психотерапевт": "тревога стресс депрессия бессонница паника настроение апатия страх",
+    "невролог": "головная боль головокружение онемение судороги спина шея",
+    "венеролог": "зуд сыпь выделения половые инфекции",
+    "дерматолог": "кожа сыпь зуд прыщи покраснение родинка",
+    "кардиолог": "сердце давление одышка боль в груди сердцебиение",
+    "хирург": "травма рана перелом ушиб опухоль",
+    "офтальмолог": "глаза зрение резь слезотечение",
+    "отоларинголог": "ухо горло нос слух насморк",
+    "стоматолог": "зуб десна челюсть",
+    "гастроэнтеролог": "живот желудок изжога тошнота диарея",
+}
+
+STOP_WORDS = {
+    "и", "в", "во", "на", "с", "со", "у", "к", "по", "не", "что", "как", "а", "но", "или", "меня", "мне",
+    "я", "мой", "моя", "это", "то", "же", "уже", "очень", "есть", "нет", "для", "при", "от", "до", "из",
+}
+
+ENDINGS = sorted([
+    "иями", "ями", "ами", "ого", "его", "ему", "ому", "ыми", "ими", "ией", "ия", "ие", "ий", "ый", "ой",
+    "ая", "яя", "ое", "ее", "ые", "ов", "ев", "ах", "ях", "ам", "ям", "ом", "ем", "ую", "юю",
+    "ит", "ят", "ет", "ут", "ют", "ать", "ять", "ить", "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+
+TOKEN_PATTERN = re.compile(r"[а-яёa-z0-9]+")
+
+
+def stem(word):
+    # Грубый стеммер: отрезаем окончание и оставляем не больше 5 букв основы
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            word = word[:-len(ending)]
+            break
+    return word[:5]
+
+
+def tokenize(text):
+    return [stem(word) for word in TOKEN_PATTERN.findall((text or "").lower().replace("ё", "е"))
+            if word not in STOP_WORDS]
+
+
+def symptom_hints(specialty):
+    name = specialty.lower()
+    return " ".join(hints for key, hints in SYMPTOM_HINTS.items() if name.startswith(key))
+
+
+class BM25:
+    def __init__(self, documents):
+        # documents - список списков токенов
+        self.documents = [Counter(tokens) for tokens in documents]
+        self.lengths = [len(tokens) for tokens in documents]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        frequencies = Counter(token for document in self.documents for token in document)
+        count = len(self.documents)
+        self.idf = {
+            token: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for token, frequency in frequencies.items()
+        }
+
+    def scores(self, query_tokens):
+        scores = []
+        for document, length in zip(self.documents, self.lengths):
+            score = 0.0
+            for token in set(query_tokens):
+                frequency = document.get(token)
+                if not frequency:
+                    continue
+                norm = K1 * (1 - B + B * length / self.average_length) if self.average_length else K1
+                score += self.idf[token] * frequency * (K1 + 1) / (frequency + norm)
+            scores.append(score)
+        return scores
+
+
+class DoctorSearch:
+    def __init__(self, data):
+        self.data = data
+        self.model = get_model(data)
+
+        # Один документ на специальность: название, описание, подсказки по симптомам и врачи клиник
+        texts = {}
+        for doctor_type in self.model.doctor_types:
+            if doctor_type.get('name'):
+                texts[doctor_type['name']] = [doctor_type['name'], doctor_type.get('description') or ""]
+        for clinic in self.model.clinics:
+            for specialty in self.model.specialties(clinic['id']):
+                parts = texts.setdefault(specialty, [specialty])
+                for clinic_doctor in self.model.doctors_with_specialty(clinic['id'], specialty):
+                    parts.extend(clinic_doctor_name(clinic_doctor))
+        self.specialties = list(texts)
+        self.index = BM25([tokenize(" ".join(parts + [symptom_hints(name)])) for name, parts in texts.items()])
+
+    def search(self, query, k=TOP_K):
+        """
+        До k специальностей, подходящих к запросу, с оценками, по убыванию оценки
+        """
+        scores = self.index.scores(tokenize(query))
+        ranked = sorted(zip(scores, self.specialties), key=lambda pair: -pair[0])
+        return [(specialty, score) for score, specialty in ranked[:k] if score > 0]
+
+    def context(self, query, k=TOP_K, max_tokens=SEARCH_CONTEXT_TOKENS):
+        """
+        Контекст для подсказки только по найденным специальностям; если ничего не нашлось -
+        общий компактный контекст в том же бюджете токенов
+        """
+        specialties = [specialty for specialty, score in self.search(query, k)]
+        if not specialties:
+            return prompt_context.get_context(self.data, max_tokens)
+        return prompt_context.build_context(self.data, max_tokens, specialties=specialties)
+
+
+_search_lock = threading.Lock()
+_last_search = None
+
+
+def get_search(data):
+    """
+    Поисковый индекс для снимка data, повторно используется для того же снимка
+    """
+    global _last_search
+    with _search_lock:
+        if _last_search is None or _last_search.data is not data:
+            _last_search = DoctorSearch(data)
+        return _last_search
+
+
+def relevant_context(data, query, k=TOP_K, max_tokens=SEARCH_CONTEXT_TOKENS):
+    return get_search(data).context(query, k, max_tokens)
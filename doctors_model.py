@@ -0,0 +1,172 @@
+import threading
+import snapshot_format
+
+# Модель данных поверх снимка results.json с заранее построенными индексами:
+# клиника по id и по номеру, кабинеты клиники, врачи клиники по специальности,
+# клиент по номеру полиса, записи по врачу и по кабинету.
+# Индексы строятся один раз на снимок, дальше все выборки - поиск в словаре
+
+
+def id_key(entity_id):
+    # Числовые идентификаторы разной длины сравниваем как числа, а не как строки
+    return len(entity_id), entity_id
+
+
+def person_name(entity):
+    person = (entity or {}).get('person', {}).get('entity', {}) or {}
+    return person.get('firstName', ''), person.get('lastName', '')
+
+
+def clinic_doctor_name(clinic_doctor):
+    return person_name(clinic_doctor.get('doctor', {}).get('entity', {}))
+
+
+def clinic_doctor_specialty(clinic_doctor):
+    return (clinic_doctor.get('doctor', {}).get('entity', {}).get('doctorType', {}) or {}).get('name', 'N/A')
+
+
+def doctor_cards(clinic_doctors_by_clinic):
+    """
+    Плоский список врачей всех клиник: id, клиника, имя, фамилия и специальность
+    """
+    cards = []
+    for clinic_id, clinic_doctors in clinic_doctors_by_clinic.items():
+        for clinic_doctor in clinic_doctors:
+            first_name, last_name = clinic_doctor_name(clinic_doctor)
+            cards.append({
+                "id": clinic_doctor['id'],
+                "clinic_id": clinic_id,
+                "first_name": first_name,
+                "last_name": last_name,
+                "specialization": clinic_doctor_specialty(clinic_doctor),
+            })
+    return cards
+
+
+class DoctorsData:
+    def __init__(self, data):
+        self.raw = data
+        self.doctor_types = data.get("doctor_types", [])
+        self.doctors = data.get("doctors", [])
+        self.customers = data.get("customers", [])
+        self.clinics = data.get("clinics", [])
+        self.offices_by_clinic = data.get("clinic_offices", {})
+        self.clinic_doctors_by_clinic = data.get("clinic_doctors", {})
+        self.schedules_by_doctor = data.get("doctor_schedules", {})
+        self.appointments_by_clinic = data.get("appointments", {})
+
+        # Клиники: номер клиники - порядковый номер в списке, начиная с 1
+        self.clinic_by_id = {clinic['id']: clinic for clinic in self.clinics}
+        self.clinic_by_number = {str(i + 1): clinic for i, clinic in enumerate(self.clinics)}
+
+        # Кабинеты по клинике и номеру кабинета
+        self.office_by_number = {
+            clinic_id: {office['officeNumber']: office for office in offices}
+            for clinic_id, offices in self.offices_by_clinic.items()
+        }
+
+        # Врачи клиник: по id, по клинике и специальности
+        self.clinic_doctor_by_id = {}
+        self.clinic_of_doctor = {}
+        self.doctors_by_specialty = {}
+        for clinic_id, clinic_doctors in self.clinic_doctors_by_clinic.items():
+            by_specialty = self.doctors_by_specialty.setdefault(clinic_id, {})
+            for clinic_doctor in clinic_doctors:
+                self.clinic_doctor_by_id[clinic_doctor['id']] = clinic_doctor
+                self.clinic_of_doctor[clinic_doctor['id']] = clinic_id
+                by_specialty.setdefault(clinic_doctor_specialty(clinic_doctor), []).append(clinic_doctor)
+
+        # Клиенты по номеру полиса
+        self.customer_by_policy = {customer['insurancePolicyNumber']: customer for customer in self.customers}
+
+        # Записи по врачу клиники и по кабинету, отсортированные по времени начала
+        self.appointments_by_doctor = {}
+        self.appointments_by_office = {}
+        for appointments in self.appointments_by_clinic.values():
+            for appointment in appointments:
+                clinic_doctor_id = (appointment.get('clinicDoctor') or {}).get('id')
+                office_id = (appointment.get('clinicOffice') or {}).get('id')
+                if clinic_doctor_id:
+                    self.appointments_by_doctor.setdefault(clinic_doctor_id, []).append(appointment)
+                if office_id:
+                    self.appointments_by_office.setdefault(office_id, []).append(appointment)
+        for index in (self.appointments_by_doctor, self.appointments_by_office):
+            for appointments in index.values():
+                appointments.sort(key=lambda appointment: appointment.get('beginDate') or '')
+
+        # Плоский список врачей для веб-страницы /doctors
+        self.doctor_cards = doctor_cards(self.clinic_doctors_by_clinic)
+
+    def clinic_at(self, number):
+        """
+        Клиника по порядковому номеру в списке, начиная с 1
+        """
+        return self.clinic_by_number.get(number)
+
+    def offices(self, clinic_id):
+        return self.offices_by_clinic.get(clinic_id, [])
+
+    def office(self, clinic_id, office_number):
+        return self.office_by_number.get(clinic_id, {}).get(office_number)
+
+    def clinic_doctors(self, clinic_id):
+        return self.clinic_doctors_by_clinic.get(clinic_id, [])
+
+    def specialties(self, clinic_id):
+        return list(self.doctors_by_specialty.get(clinic_id, {}))
+
+    def doctors_with_specialty(self, clinic_id, specialty):
+        return self.doctors_by_specialty.get(clinic_id, {}).get(specialty, [])
+
+    def customer(self, insurance_policy_number):
+        return self.customer_by_policy.get(insurance_policy_number)
+
+    def schedule(self, clinic_doctor_id):
+        return self.schedules_by_doctor.get(clinic_doctor_id, [])
+
+    def doctor_appointments(self, clinic_doctor_id, date_from=None, date_to=None):
+        appointments = self.appointments_by_doctor.get(clinic_doctor_id, [])
+        if date_from is not None:
+            appointments = [item for item in appointments if (item.get('endDate') or '') >= date_from.isoformat()]
+        if date_to is not None:
+            appointments = [item for item in appointments if (item.get('beginDate') or '') <= date_to.isoformat()]
+        return appointments
+
+    def office_appointments(self, office_id):
+        return self.appointments_by_office.get(office_id, [])
+
+
+class SectionedDoctorsData:
+    """
+    Выборки веб-приложения прямо из отображенного снимка по разделам (sectioned_snapshot):
+    клиники, кабинеты и плоский список врачей разбираются один раз, расписание врача читается
+    по одной записи при обращении, клиенты и записи на прием в память процесса не попадают
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.clinics = snapshot.section("clinics", [])
+        self.offices_by_clinic = snapshot.section("clinic_offices", {})
+        self.doctor_cards = doctor_cards(snapshot.section("clinic_doctors", {}))
+
+    def schedule(self, clinic_doctor_id):
+        return self.snapshot.section("doctor_schedules", {}).get(clinic_doctor_id) or []
+
+
+_model_lock = threading.Lock()
+_last_model = None
+
+
+def get_model(data):
+    """
+    Возвращает модель для снимка data, повторно используя уже построенную для того же снимка
+    """
+    global _last_model
+    with _model_lock:
+        if _last_model is None or _last_model.raw is not data:
+            _last_model = DoctorsData(data)
+        return _last_model
+
+
+def load_model(filename='results.json'):
+    return get_model(snapshot_format.load(filename))
@@ -0,0 +1,152 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import query_cache
+
+# Общий клиент GraphQL: одна сессия с пулом keep-alive соединений на весь процесс,
+# чтобы не открывать новое TCP+TLS соединение на каждый запрос
+
+# URL GraphQL сервера
+url = "https://smapi.pv-api.sbc.space/ds-7429590172239724545/graphql"
+
+# Размер пула соединений на хост и количество пулов (хостов)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# Таймауты по умолчанию: (подключение, чтение) в секундах
+DEFAULT_TIMEOUT = (5, 30)
+
+# Повторы только при ошибках подключения: запрос еще не ушел на сервер,
+# поэтому мутации (createClinicTable и т.п.) не задублируются
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.3
+
+# Через сколько секунд простоя соединение считается "остывшим" и его нужно прогреть
+KEEPALIVE_INTERVAL = 60
+
+_session = None
+_session_lock = threading.Lock()
+_keepalive_timer = None
+
+
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """
+    Создает сессию requests с настроенным пулом соединений и повторами подключения
+    """
+    retry = Retry(total=MAX_RETRIES, connect=MAX_RETRIES, read=0, backoff_factor=RETRY_BACKOFF)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_session():
+    """
+    Возвращает общую сессию, создавая ее при первом обращении
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def graphql_query(query, variables=None, timeout=DEFAULT_TIMEOUT, on_error=print, cache=None, partial=False):
+    """
+    Выполняет GraphQL запрос через общую сессию и возвращает поле data или None.
+    cache - QueryCache одного обхода: повторные читающие запросы берутся из него,
+    мутации сбрасывают затронутые записи.
+    С partial=True при ошибках возвращаются данные полей, выполнившихся без ошибок (не кэшируются)
+    """
+    if cache is not None and not query_cache.is_mutation(query):
+        cached = cache.get(query, variables)
+        if cached is not None:
+            return cached
+
+    try:
+        json_data = {
+            'query': query,
+            'variables': variables or {}
+        }
+
+        response = get_session().post(url, json=json_data, timeout=timeout)
+
+        if response.status_code == 200:
+            result = response.json()
+            if 'errors' in result:
+                on_error(f"GraphQL Errors: {result['errors']}")
+                return partial_data(result, partial)
+            return store_result(query, variables, result.get('data'), cache)
+        else:
+            on_error(f"HTTP Error {response.status_code}: {response.text}")
+            return None
+
+    except Exception as e:
+        on_error(f"Exception occurred: {str(e)}")
+        return None
+
+
+def partial_data(result, partial):
+    # Частичный ответ пакетного запроса: алиасы с ошибками равны null, остальные заполнены
+    if partial and result.get('data'):
+        return result['data']
+    return None
+
+
+def store_result(query, variables, data, cache=None):
+    """
+    Запоминает ответ читающего запроса в cache или сбрасывает его записи после мутации
+    """
+    if cache is None:
+        return data
+    if query_cache.is_mutation(query):
+        cache.invalidate_for_mutation(query)
+    else:
+        cache.set(query, variables, data)
+    return data
+
+
+def warm_up(connections=1):
+    """
+    Заранее открывает соединения с сервером легким запросом { __typename }
+    """
+    threads = [
+        threading.Thread(target=graphql_query, args=("query { __typename }",), kwargs={'on_error': lambda _: None})
+        for _ in range(connections)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def start_keepalive(interval=KEEPALIVE_INTERVAL):
+    """
+    Периодически прогревает соединение, чтобы сервер не закрыл его по простою
+    """
+    global _keepalive_timer
+
+    def tick():
+        warm_up()
+        start_keepalive(interval)
+
+    stop_keepalive()
+    _keepalive_timer = threading.Timer(interval, tick)
+    _keepalive_timer.daemon = True
+    _keepalive_timer.start()
+
+
+def stop_keepalive():
+    global _keepalive_timer
+    if _keepalive_timer is not None:
+        _keepalive_timer.cancel()
+        _keepalive_timer = None
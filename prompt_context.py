@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime
+from doctors_model import get_model, clinic_doctor_name
+
+# Компактный контекст о клиниках и врачах для системного сообщения ассистента вместо
+# полного снимка results.json. Ассистенту нужны только специальности, какие врачи каких
+# специальностей есть в каждой клинике и ближайшее свободное окно; клиенты, записи
+# и вложенные объекты сервера в контекст не попадают.
+# Размер ограничен бюджетом токенов, строки добавляются по важности, пока бюджет не кончится.
+# Контекст строится один раз на снимок
+
+# Бюджет токенов на контекст
+CONTEXT_TOKENS = 1500
+# Приблизительно символов на токен для русского текста
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def short_date(value):
+    # 2024-10-27T05:00:00 -> 2024-10-27 05:00
+    return value[:16].replace('T', ' ') if value else ''
+
+
+def next_free_slot(model, clinic_doctors, now):
+    begins = [
+        slot.get('beginDate')
+        for clinic_doctor in clinic_doctors
+        for slot in model.schedule(clinic_doctor['id'])
+        if slot.get('beginDate') and (slot.get('endDate') or slot['beginDate']) >= now
+    ]
+    return min(begins) if begins else None
+
+
+def specialty_lines(model, specialties=None):
+    lines = []
+    for doctor_type in model.doctor_types:
+        name = doctor_type.get('name')
+        if not name or (specialties is not None and name not in specialties):
+            continue
+        description = doctor_type.get('description')
+        lines.append(f"- {name}: {description}" if description else f"- {name}")
+    known = {doctor_type.get('name') for doctor_type in model.doctor_types}
+    for clinic in model.clinics:
+        for specialty in model.specialties(clinic['id']):
+            if specialty not in known and (specialties is None or specialty in specialties):
+                known.add(specialty)
+                lines.append(f"- {specialty}")
+    return lines
+
+
+def clinic_lines(model, now, specialties=None):
+    lines = []
+    for clinic in model.clinics:
+        clinic_specialties = [
+            specialty for specialty in model.specialties(clinic['id'])
+            if specialties is None or specialty in specialties
+        ]
+        if specialties is not None and not clinic_specialties:
+            continue
+        lines.append(f"{clinic.get('name')}:")
+        if not clinic_specialties:
+            lines.append("- врачей нет")
+        for specialty in clinic_specialties:
+            clinic_doctors = model.doctors_with_specialty(clinic['id'], specialty)
+            names = ", ".join(
+                " ".join(part for part in clinic_doctor_name(clinic_doctor) if part)
+                for clinic_doctor in clinic_doctors
+            )
+            slot = next_free_slot(model, clinic_doctors, now)
+            free = f"; ближайшее окно {short_date(slot)}" if slot else "; свободных окон нет"
+            lines.append(f"- {specialty}: {names}{free}")
+    return lines
+
+
+def build_context(data, max_tokens=CONTEXT_TOKENS, now=None, specialties=None):
+    """
+    Текст контекста для системного сообщения в пределах бюджета токенов;
+    specialties ограничивает контекст перечисленными специальностями
+    """
+    model = get_model(data)
+    now = (now or datetime.now()).isoformat()
+    sections = [
+        ("Специальности врачей:", specialty_lines(model, specialties)),
+        ("Врачи в клиниках:", clinic_lines(model, now, specialties)),
+    ]
+
+    lines = []
+    used = 0
+    for title, section_lines in sections:
+        for line in [title] + section_lines:
+            tokens = estimate_tokens(line) + 1
+            if used + tokens > max_tokens:
+                lines.append("... (список сокращен)")
+                return "\n".join(lines)
+            lines.append(line)
+            used += tokens
+    return "\n".join(lines)
+
+
+_context_lock = threading.Lock()
+_last_context = (None, None, None)
+
+
+def get_context(data, max_tokens=CONTEXT_TOKENS):
+    """
+    Контекст для снимка data; для того же снимка повторно не строится
+    """
+    global _last_context
+    with _context_lock:
+        if _last_context[0] is not data or _last_context[1] != max_tokens:
+            _last_context = (data, max_tokens, build_context(data, max_tokens))
+        return _last_context[2]
@@ -0,0 +1,349 @@
+from datetime import datetime, timedelta
+
+# Тексты GraphQL запросов. Каждая функция возвращает пару (query, variables),
+# чтобы один и тот же запрос можно было выполнить и синхронно, и асинхронно
+
+
+# Наборы полей для запросов по клинике и врачу клиники. Вынесены отдельно,
+# чтобы одиночные и пакетные запросы (batch_queries.py) возвращали одинаковые данные
+CLINIC_OFFICE_SELECTION = """{
+        elems {
+          id
+          clinic {
+            id
+            name
+          }
+          officeNumber
+        }
+      }"""
+
+CLINIC_DOCTOR_SELECTION = """{
+            elems {
+                id
+                doctor {
+                    entity {
+                        person {
+                            entity {
+                                firstName
+                                lastName
+                            }
+                        }
+                        doctorType {
+                            name
+                        }
+                    }
+                }
+            }
+        }"""
+
+AVAILABILITY_SELECTION = """{
+            elems {
+                id
+                beginDate
+                endDate
+                clinicOffice {
+                    id
+                    officeNumber
+                }
+            }
+        }"""
+
+# То же, что AVAILABILITY_SELECTION, но с врачом клиники для группировки строк по врачу
+CLINIC_AVAILABILITY_SELECTION = """{
+            elems {
+                id
+                beginDate
+                endDate
+                clinicOffice {
+                    id
+                    officeNumber
+                }
+                clinicDoctor {
+                    id
+                }
+            }
+        }"""
+
+# Сокращенный набор полей записи: только идентификаторы связанных сущностей
+CLINIC_TABLE_ID_SELECTION = """{
+            elems {
+                id
+                beginDate
+                endDate
+                clinicOffice {
+                    id
+                    officeNumber
+                }
+                customer {
+                    entityId
+                }
+                clinicDoctor {
+                    id
+                }
+            }
+        }"""
+
+CLINIC_TABLE_SELECTION = """{
+            elems {
+                id
+                beginDate
+                endDate
+                clinicOffice {
+                    id
+                    officeNumber
+                }
+                customer {
+                    entity {
+                        person {
+                            entity {
+                                firstName
+                                lastName
+                            }
+                        }
+                        insurancePolicyNumber
+                        phoneNumber
+                    }
+                }
+                clinicDoctor {
+                    id
+                    doctor {
+                        entity {
+                            person {
+                                entity {
+                                    firstName
+                                    lastName
+                                }
+                            }
+                            doctorType {
+                                name
+                            }
+                        }
+                    }
+                }
+            }
+        }"""
+
+
+def doctor_types_query():
+    query = """
+    query {
+      searchDoctorType(cond: "it.isDel == false") {
+        elems {
+          id
+          name
+          description
+        }
+      }
+    }
+    """
+    return query, None
+
+
+def doctors_query():
+    query = """
+    query {
+      searchDoctor {
+        elems {
+          id
+          doctorType {
+            id
+            name
+          }
+          person {
+            entityId
+            entity {
+              firstName
+              lastName
+            }
+          }
+        }
+      }
+    }
+    """
+    return query, None
+
+
+def customers_query(since_id=None):
+    """
+    Клиенты; since_id оставляет только созданных после клиента с этим идентификатором
+    """
+    cond = "1==1" if since_id is None else f"it.id > '{since_id}'"
+    query = """
+    query {
+      searchCustomer(cond: "%s") {
+        elems {
+          id
+          insurancePolicyNumber
+          phoneNumber
+          person {
+            entityId
+            entity {
+              firstName
+              lastName
+            }
+          }
+        }
+      }
+    }
+    """ % cond
+    return query, None
+
+
+def clinics_query():
+    query = """
+    query {
+      searchClinic {
+        elems {
+          id
+          name
+        }
+      }
+    }
+    """
+    return query, None
+
+
+def clinic_offices_query(clinic_id):
+    query = """
+    query {
+      searchClinicOffice(cond: "it.clinic.id == '%s'") %s
+    }
+    """ % (clinic_id, CLINIC_OFFICE_SELECTION)
+    return query, None
+
+
+def default_date_from():
+    # Округляем до минуты, чтобы повторные запросы расписания попадали в кэш ответов
+    return datetime.now().replace(second=0, microsecond=0)
+
+
+def default_date_range(date_from=None, date_to=None):
+    if date_from is None:
+        date_from = default_date_from()
+    if date_to is None:
+        date_to = date_from + timedelta(days=7)
+    return date_from, date_to
+
+
+def doctor_availability_query(clinic_doctor_id, date_from=None, date_to=None):
+    date_from, date_to = default_date_range(date_from, date_to)
+
+    query = """
+    query searchClinicDoctorAvailability($clinicDoctorId: String!, $dateFrom: _DateTime!, $dateTo: _DateTime!) {
+        searchClinicDoctorAvailability(
+            cond: "it.clinicDoctor.id == ${clinicDoctorId} && it.endDate >= ${dateFrom} && it.beginDate <= ${dateTo}"
+        ) @strExpr(string:$clinicDoctorId, dateTimes:[$dateFrom, $dateTo]) %s
+    }
+    """ % AVAILABILITY_SELECTION
+
+    variables = {
+        "clinicDoctorId": clinic_doctor_id,
+        "dateFrom": date_from.isoformat(),
+        "dateTo": date_to.isoformat()
+    }
+    return query, variables
+
+
+def clinic_availability_query(clinic_id, date_from=None, date_to=None):
+    """
+    Расписание всех врачей клиники за период одним запросом
+    """
+    date_from, date_to = default_date_range(date_from, date_to)
+
+    query = """
+    query searchClinicAvailability($dateFrom: _DateTime!, $dateTo: _DateTime!) {
+        searchClinicDoctorAvailability(
+            cond: "it.clinicDoctor.clinic.id == '%s' && it.endDate >= ${dateFrom} && it.beginDate <= ${dateTo}"
+        ) @strExpr(dateTimes:[$dateFrom, $dateTo]) %s
+    }
+    """ % (clinic_id, CLINIC_AVAILABILITY_SELECTION)
+
+    variables = {
+        "dateFrom": date_from.isoformat(),
+        "dateTo": date_to.isoformat()
+    }
+    return query, variables
+
+
+def group_availability(rows, clinic_doctor_ids=()):
+    """
+    Группирует строки расписания по врачу клиники: {clinic_doctor_id: [строки]}.
+    Для врачей из clinic_doctor_ids без свободных окон возвращается пустой список
+    """
+    schedules = {clinic_doctor_id: [] for clinic_doctor_id in clinic_doctor_ids}
+    for row in rows or []:
+        row = dict(row)
+        clinic_doctor_id = (row.pop('clinicDoctor', None) or {}).get('id')
+        if clinic_doctor_id:
+            schedules.setdefault(clinic_doctor_id, []).append(row)
+    return schedules
+
+
+def clinic_doctors_query(clinic_id):
+    query = """
+    query {
+        searchClinicDoctor(
+            cond: "it.clinic.id == '%s'"
+        ) %s
+    }
+    """ % (clinic_id, CLINIC_DOCTOR_SELECTION)
+    return query, None
+
+
+def appointments_horizon():
+    """
+    Период записей для снимка по умолчанию: записи, которые еще не закончились
+    """
+    date_from = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return date_from, None
+
+
+def clinic_tables_query(clinic_id, date_from=None, date_to=None, fields=CLINIC_TABLE_SELECTION, since_id=None):
+    """
+    Записи клиники; date_from/date_to ограничивают период в cond, fields задает набор полей,
+    since_id оставляет только записи, созданные после записи с этим идентификатором
+    """
+    cond, params, variables = date_window_cond(date_from, date_to)
+    if since_id is not None:
+        cond += f" && it.id > '{since_id}'"
+    if not variables:
+        query = """
+    query {
+        searchClinicTable(cond: "it.clinic.id == '%s'%s") %s
+    }
+    """ % (clinic_id, cond, fields)
+        return query, None
+
+    query = """
+    query searchClinicTable(%s) {
+        searchClinicTable(cond: "it.clinic.id == '%s'%s") @strExpr(dateTimes:[%s]) %s
+    }
+    """ % (", ".join(params), clinic_id, cond, ", ".join("$" + name for name in variables), fields)
+    return query, variables
+
+
+def date_window_cond(date_from=None, date_to=None):
+    """
+    Условие пересечения с периодом для cond: (текст условия, параметры запроса, переменные)
+    """
+    cond = ""
+    params = []
+    variables = {}
+    if date_from is not None:
+        cond += " && it.endDate >= ${dateFrom}"
+        params.append("$dateFrom: _DateTime!")
+        variables["dateFrom"] = date_from.isoformat()
+    if date_to is not None:
+        cond += " && it.beginDate <= ${dateTo}"
+        params.append("$dateTo: _DateTime!")
+        variables["dateTo"] = date_to.isoformat()
+    return cond, params, variables
+
+
+def extract_elems(result, field):
+    """
+    Достает список elems из ответа search-запроса или None, если ответа нет
+    """
+    if result and field in result and result[field] and 'elems' in result[field]:
+        return result[field]['elems']
+    return None
@@ -0,0 +1,114 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Кэш ответов на читающие GraphQL запросы: ключ - нормализованный текст запроса
+# плюс переменные, время жизни зависит от типа запроса, размер ограничен (LRU)
+
+# Максимальное количество запомненных ответов
+MAX_SIZE = 256
+
+# Время жизни ответа в секундах по типу запроса (корневому полю)
+TTLS = {
+    'searchDoctorType': 3600,
+    'searchClinic': 3600,
+    'searchClinicOffice': 3600,
+    'searchDoctor': 600,
+    'searchClinicDoctor': 600,
+    'searchCustomer': 60,
+    'searchClinicDoctorAvailability': 30,
+    'searchClinicTable': 30,
+}
+DEFAULT_TTL = 30
+
+# Какие типы запросов устаревают после мутации
+INVALIDATES = {
+    'createClinicTable': ('searchClinicTable', 'searchClinicDoctorAvailability'),
+    'createPerson': ('searchCustomer',),
+    'createCustomer': ('searchCustomer',),
+}
+
+FIELD_PATTERN = re.compile(r'\b((?:search|create|update|delete)\w+)\s*\(?')
+
+
+def normalize_query(query):
+    return " ".join(query.split())
+
+
+def is_mutation(query):
+    return query.lstrip().startswith('mutation')
+
+
+def query_fields(query):
+    """
+    Возвращает имена корневых полей search*/create*/... в запросе
+    """
+    return set(FIELD_PATTERN.findall(query))
+
+
+class QueryCache:
+    def __init__(self, max_size=MAX_SIZE, ttls=None, default_ttl=DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttls = TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, query, variables=None):
+        return normalize_query(query) + "|" + json.dumps(variables or {}, sort_keys=True, ensure_ascii=False)
+
+    def ttl(self, fields):
+        return min((self.ttls.get(field, self.default_ttl) for field in fields), default=self.default_ttl)
+
+    def get(self, query, variables=None):
+        key = self.key(query, variables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, query, variables, data):
+        if data is None:
+            return
+        fields = query_fields(query)
+        key = self.key(query, variables)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl(fields), fields, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *fields):
+        """
+        Удаляет ответы на запросы с указанными корневыми полями, без аргументов - все
+        """
+        with self._lock:
+            if not fields:
+                self._entries.clear()
+                return
+            fields = set(fields)
+            for key in [key for key, entry in self._entries.items() if entry[1] & fields]:
+                del self._entries[key]
+
+    def invalidate_for_mutation(self, query):
+        """
+        Сбрасывает ответы, которые могла изменить мутация; неизвестная мутация сбрасывает весь кэш
+        """
+        fields = set()
+        for mutation in query_fields(query):
+            if mutation not in INVALIDATES:
+                self.invalidate()
+                return
+            fields.update(INVALIDATES[mutation])
+        if fields:
+            self.invalidate(*fields)
@@ -0,0 +1,312 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import snapshot_format
+
+# Снимок из отдельных разделов с оглавлением в начале файла (results.snap).
+# Потребителю, которому нужен один раздел (например, /doctors читает только clinic_doctors),
+# не нужно разбирать весь results.json: файл отображается в память через mmap,
+# по оглавлению находится смещение раздела, и разбирается только он.
+# Разделы-словари (врачи и кабинеты клиник, расписания, записи, таблицы entities) хранятся
+# по записям со своим указателем: запись разбирается прямо из отображения при обращении
+# и не остается в памяти процесса. Поэтому несколько воркеров, отобразивших один файл,
+# делят его страницы в кэше ОС, а у каждого в памяти только оглавление, указатели
+# и то, что он сам решил запомнить.
+#
+# Формат файла:
+#   заголовок  - MAGIC (4 байта), версия (2 байта), длина оглавления (4 байта),
+#                поколение снимка (8 байт), little-endian;
+#   оглавление - JSON {"имя раздела": [смещение от начала файла, длина]}; у раздела по записям
+#                еще [смещение указателя, длина указателя];
+#   разделы    - компактный JSON каждого раздела нормализованного снимка (см. snapshot_format),
+#                таблицы entities лежат отдельными разделами "entities.<тип>";
+#   раздел по записям - подряд компактный JSON каждой записи, указатель - JSON
+#                {"ключ": [смещение от начала раздела, длина]}
+
+SECTIONS_FILE = "results.snap"
+MAGIC = b"DSNP"
+VERSION = 3
+HEADER = struct.Struct("<4sHIQ")
+
+# Разделы, которые хранятся по записям; список клиентов entities.customers - по номеру записи
+KEYED_SECTIONS = ("clinic_offices", "clinic_doctors", "doctor_schedules", "appointments",
+                  "entities.clinic_doctors", "entities.offices", "entities.customers")
+
+# Какие таблицы entities нужны записям раздела, чтобы восстановить их в структуре results.json
+SECTION_ENTITIES = {
+    "clinic_doctors": ("clinic_doctors",),
+    "doctor_schedules": ("offices",),
+    "appointments": ("offices", "customers", "clinic_doctors"),
+}
+
+
+def dump(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode_sections(data):
+    """
+    {имя раздела: bytes} для обычных разделов и {имя раздела: {ключ: bytes}} для разделов по записям
+    """
+    normalized = snapshot_format.normalize(data)
+    sections = {}
+    for name, value in normalized.items():
+        if name == "entities":
+            for entity_type, items in value.items():
+                sections["entities." + entity_type] = items
+        else:
+            sections[name] = value
+
+    encoded = {}
+    for name, value in sections.items():
+        if name in KEYED_SECTIONS:
+            items = enumerate(value) if isinstance(value, list) else value.items()
+            encoded[name] = {str(key): dump(item) for key, item in items}
+        else:
+            encoded[name] = dump(value)
+    return encoded
+
+
+def save(data, filename=SECTIONS_FILE, generation=0):
+    """
+    Атомарно записывает снимок по разделам с оглавлением
+    """
+    sections = encode_sections(data)
+
+    # Раздел по записям: записи подряд, затем указатель со смещениями записей
+    blobs = {}
+    for name, value in sections.items():
+        if isinstance(value, dict):
+            index = {}
+            offset = 0
+            for key, record in value.items():
+                index[key] = [offset, len(record)]
+                offset += len(record)
+            blobs[name] = (b"".join(value.values()), dump(index))
+        else:
+            blobs[name] = (value, None)
+
+    # Длина оглавления зависит от смещений, поэтому сначала считаем ее с заведомо длинными числами
+    names = list(blobs)
+    toc_size = len(json.dumps({name: [2 ** 40] * 4 for name in names}, ensure_ascii=False).encode('utf-8'))
+    offset = HEADER.size + toc_size
+    toc = {}
+    for name in names:
+        body, index = blobs[name]
+        toc[name] = [offset, len(body)]
+        offset += len(body)
+        if index is not None:
+            toc[name] += [offset, len(index)]
+            offset += len(index)
+    toc_bytes = json.dumps(toc, ensure_ascii=False).encode('utf-8').ljust(toc_size)
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=".results-", suffix=".snap")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, toc_size, generation))
+            f.write(toc_bytes)
+            for name in names:
+                body, index = blobs[name]
+                f.write(body)
+                if index is not None:
+                    f.write(index)
+        os.chmod(tmp_name, snapshot_format.file_mode(filename))
+        os.replace(tmp_name, filename)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+class MemoTable:
+    """
+    Таблица entities с запоминанием разобранных объектов на время одного чтения,
+    чтобы одинаковые ссылки в записях раздела давали один объект
+    """
+
+    def __init__(self, records, memo):
+        self.records = records
+        self.memo = memo
+
+    def __getitem__(self, ref):
+        if ref not in self.memo:
+            self.memo[ref] = self.records[ref]
+        return self.memo[ref]
+
+
+class Records:
+    """
+    Раздел по записям: отображение ключ -> запись в структуре results.json.
+    Запись разбирается из отображенного файла при каждом обращении и не запоминается
+    """
+
+    def __init__(self, snapshot, name, index):
+        self.snapshot = snapshot
+        self.name = name
+        self.index = index
+        self.base = snapshot.toc[name][0]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __contains__(self, key):
+        return str(key) in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def raw(self, key):
+        """
+        Байты записи, как она записана в файле; одинаковые байты - одинаковая запись
+        """
+        offset, length = self.index[str(key)]
+        return self.snapshot.read(self.base + offset, length)
+
+    def __getitem__(self, key):
+        return self.decode(self.raw(key), {})
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        memo = {}
+        for key in self.index:
+            yield key, self.decode(self.raw(key), memo)
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def decode(self, raw, memo):
+        value = json.loads(raw.decode('utf-8'))
+        if self.name not in SECTION_ENTITIES:
+            return value
+        tables = {
+            entity_type: MemoTable(self.snapshot.entities(entity_type), memo.setdefault(entity_type, {}))
+            for entity_type in SECTION_ENTITIES[self.name]
+        }
+        if self.name == "clinic_doctors":
+            return [snapshot_format.resolve(tables["clinic_doctors"], ref) for ref in value]
+        if self.name == "doctor_schedules":
+            return snapshot_format.rehydrate_rows(value, tables["offices"])
+        return snapshot_format.rehydrate_rows(value, tables["offices"], tables["customers"], tables["clinic_doctors"])
+
+
+class SectionedSnapshot:
+    """
+    Снимок, обычные разделы которого разбираются при первом обращении и запоминаются,
+    а разделы по записям читаются по одной записи
+    """
+
+    def __init__(self, filename=SECTIONS_FILE):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._raw = {}
+        self._records = {}
+        with open(filename, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, toc_size, self.generation = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{filename} is not a sectioned snapshot")
+            self.toc = json.loads(self._map[HEADER.size:HEADER.size + toc_size].decode('utf-8'))
+        except Exception:
+            self._map.close()
+            raise
+
+    def keys(self):
+        return [name for name in self.toc if not name.startswith("entities.")]
+
+    def __contains__(self, name):
+        return name in self.toc
+
+    def read(self, offset, length):
+        return self._map[offset:offset + length]
+
+    def raw(self, name):
+        """
+        Обычный раздел в нормализованном виде, как он записан в файле
+        """
+        with self._lock:
+            if name not in self._raw:
+                offset, length = self.toc[name][:2]
+                self._raw[name] = json.loads(self.read(offset, length).decode('utf-8'))
+            return self._raw[name]
+
+    def records(self, name):
+        """
+        Раздел по записям; в памяти остается только его указатель
+        """
+        with self._lock:
+            if name not in self._records:
+                index_offset, index_length = self.toc[name][2:]
+                index = json.loads(self.read(index_offset, index_length).decode('utf-8'))
+                self._records[name] = Records(self, name, index)
+            return self._records[name]
+
+    def entities(self, entity_type):
+        name = "entities." + entity_type
+        return self.records(name) if name in self.toc else {}
+
+    def section(self, name, default=None):
+        """
+        Раздел в структуре results.json: обычный раздел целиком, раздел по записям - как Records
+        """
+        if name not in self.toc:
+            return default
+        if len(self.toc[name]) > 2:
+            return self.records(name)
+        return self.raw(name)
+
+    def __getitem__(self, name):
+        if name not in self.toc:
+            raise KeyError(name)
+        return self.section(name)
+
+    def get(self, name, default=None):
+        return self.section(name, default)
+
+    def to_snapshot(self):
+        """
+        Весь снимок в структуре results.json
+        """
+        snapshot = {}
+        for name in self.keys():
+            if name in ("format", "version"):
+                continue
+            value = self.section(name)
+            snapshot[name] = dict(value.items()) if isinstance(value, Records) else value
+        return snapshot
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_generation(filename=SECTIONS_FILE):
+    """
+    Поколение снимка из заголовка файла, None - если файла нет или он другого формата
+    """
+    try:
+        with open(filename, 'rb') as f:
+            magic, version, toc_size, generation = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    # Поколение лежит на одном месте во всех версиях формата, нумерация продолжается после обновления версии
+    return generation if magic == MAGIC else None
+
+
+def load(filename=SECTIONS_FILE):
+    with SectionedSnapshot(filename) as snapshot:
+        return snapshot.to_snapshot()
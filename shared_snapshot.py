@@ -0,0 +1,65 @@
+import os
+import threading
+import sectioned_snapshot
+
+# Общий для всех процессов снимок данных о врачах. Несколько воркеров uvicorn отображают
+# в память один и тот же файл results.snap (см. sectioned_snapshot): страницы файла лежат
+# в кэше ОС один раз, сколько бы воркеров ни было. Расписания, записи и врачи клиник читаются
+# из отображения по одной записи и не копируются в память воркера, поэтому с ростом числа
+# воркеров растет только их небольшая собственная часть (оглавление, указатели, справочники).
+#
+# Обновление - атомарная подмена файла (os.replace) с увеличением поколения в заголовке.
+# Воркер при каждом обращении сверяет файл на диске с отображенным (stat) и, если файл
+# подменили, отображает новый, поэтому после подмены все воркеры видят одно и то же поколение.
+# Старое отображение закрывается сборщиком мусора, когда его перестают использовать текущие запросы
+
+
+def file_id(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def publish(data, filename=sectioned_snapshot.SECTIONS_FILE):
+    """
+    Записывает новое поколение снимка и атомарно подменяет им старое; возвращает номер поколения
+    """
+    generation = (sectioned_snapshot.read_generation(filename) or 0) + 1
+    sectioned_snapshot.save(data, filename, generation)
+    return generation
+
+
+class SharedSnapshot:
+    def __init__(self, filename=sectioned_snapshot.SECTIONS_FILE):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._snapshot = None
+
+    def current(self):
+        """
+        Отображение текущего поколения снимка или None, если снимка еще нет
+        """
+        current_id = file_id(self.filename)
+        if current_id == self._file_id:
+            return self._snapshot
+
+        with self._lock:
+            if current_id != self._file_id:
+                try:
+                    snapshot = sectioned_snapshot.SectionedSnapshot(self.filename)
+                except (OSError, ValueError):
+                    return self._snapshot
+                self._snapshot, self._file_id = snapshot, current_id
+            return self._snapshot
+
+    @property
+    def generation(self):
+        snapshot = self.current()
+        return snapshot.generation if snapshot is not None else None
+
+    def section(self, name, default=None):
+        snapshot = self.current()
+        return snapshot.section(name, default) if snapshot is not None else default
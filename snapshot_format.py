@@ -0,0 +1,191 @@
+import json
+import os
+import tempfile
+
+# Нормализованный формат снимка results.json. В исходном снимке каждая запись (appointments)
+# и каждое свободное окно несут полные копии клиента, врача клиники с врачом, персоной и
+# специальностью и кабинета. В нормализованном снимке такие объекты хранятся один раз
+# в разделе "entities", а в записях остаются только ссылки:
+# - врач клиники и кабинет - по id;
+# - клиент записи (у него нет id в ответе сервера) - по номеру в списке уникальных клиентов.
+# При загрузке rehydrate() восстанавливает привычную структуру, причем одинаковые объекты
+# во всех записях - это один и тот же объект в памяти, а не копии
+
+FORMAT = "normalized"
+FORMAT_VERSION = 1
+
+
+def content_key(item):
+    return json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+class Interner:
+    """
+    Таблица уникальных объектов одного типа. Объект с id заменяется ссылкой на id,
+    если под этим id в таблице лежит такой же объект, иначе остается в записи как есть
+    """
+
+    def __init__(self, by_id=True):
+        self.by_id = by_id
+        self.items = {} if by_id else []
+        self._keys = {}
+
+    def ref(self, item):
+        if not isinstance(item, dict):
+            return item
+        key = content_key(item)
+        if not self.by_id:
+            if key not in self._keys:
+                self._keys[key] = len(self.items)
+                self.items.append(item)
+            return self._keys[key]
+
+        item_id = item.get('id')
+        if item_id is None:
+            return item
+        if item_id not in self.items:
+            self.items[item_id] = item
+            self._keys[item_id] = key
+        elif self._keys[item_id] != key:
+            return item
+        return item_id
+
+
+def is_normalized(data):
+    return isinstance(data, dict) and data.get("format") == FORMAT
+
+
+def normalize_rows(rows, offices, customers=None, clinic_doctors=None):
+    normalized = []
+    for row in rows:
+        row = dict(row)
+        if 'clinicOffice' in row:
+            row['clinicOffice'] = offices.ref(row['clinicOffice'])
+        if customers is not None and 'customer' in row:
+            row['customer'] = customers.ref(row['customer'])
+        if clinic_doctors is not None and 'clinicDoctor' in row:
+            row['clinicDoctor'] = clinic_doctors.ref(row['clinicDoctor'])
+        normalized.append(row)
+    return normalized
+
+
+def normalize(data):
+    """
+    Переводит снимок в нормализованный формат; уже нормализованный возвращает как есть
+    """
+    if is_normalized(data):
+        return data
+
+    clinic_doctors = Interner()
+    offices = Interner()
+    customers = Interner(by_id=False)
+
+    normalized = {key: value for key, value in data.items()
+                  if key not in ("clinic_doctors", "doctor_schedules", "appointments")}
+    normalized["format"] = FORMAT
+    normalized["version"] = FORMAT_VERSION
+    normalized["clinic_doctors"] = {
+        clinic_id: [clinic_doctors.ref(clinic_doctor) for clinic_doctor in items]
+        for clinic_id, items in data.get("clinic_doctors", {}).items()
+    }
+    normalized["doctor_schedules"] = {
+        clinic_doctor_id: normalize_rows(rows, offices)
+        for clinic_doctor_id, rows in data.get("doctor_schedules", {}).items()
+    }
+    normalized["appointments"] = {
+        clinic_id: normalize_rows(rows, offices, customers, clinic_doctors)
+        for clinic_id, rows in data.get("appointments", {}).items()
+    }
+    normalized["entities"] = {
+        "clinic_doctors": clinic_doctors.items,
+        "offices": offices.items,
+        "customers": customers.items,
+    }
+    return normalized
+
+
+def resolve(table, ref):
+    # Ссылка - это id (строка) или номер (число); объект, оставленный в записи, возвращаем как есть
+    if isinstance(ref, dict) or ref is None:
+        return ref
+    return table[ref]
+
+
+def rehydrate_rows(rows, offices, customers=None, clinic_doctors=None):
+    rehydrated = []
+    for row in rows:
+        row = dict(row)
+        if 'clinicOffice' in row:
+            row['clinicOffice'] = resolve(offices, row['clinicOffice'])
+        if customers is not None and 'customer' in row:
+            row['customer'] = resolve(customers, row['customer'])
+        if clinic_doctors is not None and 'clinicDoctor' in row:
+            row['clinicDoctor'] = resolve(clinic_doctors, row['clinicDoctor'])
+        rehydrated.append(row)
+    return rehydrated
+
+
+def rehydrate(data):
+    """
+    Восстанавливает из нормализованного снимка структуру results.json; обычный снимок возвращает как есть
+    """
+    if not is_normalized(data):
+        return data
+
+    entities = data.get("entities", {})
+    clinic_doctors = entities.get("clinic_doctors", {})
+    offices = entities.get("offices", {})
+    customers = entities.get("customers", [])
+
+    rehydrated = {key: value for key, value in data.items() if key not in ("format", "version", "entities")}
+    rehydrated["clinic_doctors"] = {
+        clinic_id: [resolve(clinic_doctors, ref) for ref in refs]
+        for clinic_id, refs in data.get("clinic_doctors", {}).items()
+    }
+    rehydrated["doctor_schedules"] = {
+        clinic_doctor_id: rehydrate_rows(rows, offices)
+        for clinic_doctor_id, rows in data.get("doctor_schedules", {}).items()
+    }
+    rehydrated["appointments"] = {
+        clinic_id: rehydrate_rows(rows, offices, customers, clinic_doctors)
+        for clinic_id, rows in data.get("appointments", {}).items()
+    }
+    return rehydrated
+
+
+def load(filename):
+    """
+    Загружает снимок в любом из двух форматов и возвращает его в структуре results.json
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        return rehydrate(json.load(f))
+
+
+def file_mode(filename):
+    """
+    Права для нового файла снимка: как у заменяемого файла, иначе обычные права с учетом umask.
+    mkstemp создает временный файл с правами 0600, и без этого снимок стал бы недоступен другим процессам
+    """
+    try:
+        return os.stat(filename).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def save(data, filename):
+    """
+    Атомарно записывает снимок в нормализованном формате: сначала во временный файл, затем заменяет старый
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=".results-", suffix=".json")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(normalize(data), f, ensure_ascii=False, separators=(',', ':'))
+        os.chmod(tmp_name, file_mode(filename))
+        os.replace(tmp_name, filename)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
@@ -0,0 +1,130 @@
+import os
+import random
+import threading
+import delta_sync
+import doctors_model
+import snapshot_format
+import shared_snapshot
+import sqlite_store
+
+# Фоновое обновление снимка данных о врачах: поток раз в REFRESH_INTERVAL секунд
+# (со случайным сдвигом, чтобы несколько процессов не ходили на сервер одновременно)
+# синхронизирует results.json и атомарно подменяет данные в памяти.
+# Читатели получают целый снимок через current() и никогда не ждут сети
+
+# Период обновления и максимальный случайный сдвиг, в секундах
+REFRESH_INTERVAL = 300
+REFRESH_JITTER = 30
+
+
+def save_snapshot(data, filename):
+    """
+    Атомарно записывает снимок в нормализованном формате
+    """
+    snapshot_format.save(data, filename)
+
+
+class SnapshotRefresher:
+    def __init__(self, filename=delta_sync.SNAPSHOT_FILE, interval=REFRESH_INTERVAL, jitter=REFRESH_JITTER,
+                 on_error=print, sections_file=None, sqlite_file=None):
+        self.filename = filename
+        # Если задан, после каждого обновления публикуется и общий для процессов снимок по разделам
+        self.sections_file = sections_file
+        # Если задана, база SQLite обновляется вместе со снимком и отдается читателям через model()
+        self.sqlite_file = sqlite_file
+        self._sqlite_synced = False
+        self.interval = interval
+        self.jitter = jitter
+        self.on_error = on_error
+        self.generation = 0
+        self._data = delta_sync.load_snapshot(filename)
+        if self._data is None and sqlite_file and os.path.exists(sqlite_file):
+            self._data = sqlite_store.get_store(sqlite_file).to_snapshot()
+        self._data = self._data or {}
+        self._listeners = []
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """
+        Текущий снимок. Объект не меняется после публикации, его можно читать без блокировок
+        """
+        return self._data
+
+    def model(self):
+        """
+        Модель для выборок (запись к врачу): база SQLite, если она ведется, иначе индексы над снимком в памяти
+        """
+        if self.sqlite_file:
+            return sqlite_store.get_store(self.sqlite_file)
+        return doctors_model.get_model(self._data)
+
+    def save_sqlite(self, old_data, data):
+        store = sqlite_store.get_store(self.sqlite_file)
+        # В первый раз база могла остаться от другого снимка, поэтому записываем ее целиком,
+        # дальше - только изменившиеся строки
+        if self._sqlite_synced:
+            store.save_changes(old_data, data)
+        else:
+            store.save_snapshot(data)
+            self._sqlite_synced = True
+
+    def add_listener(self, callback):
+        """
+        callback(old_data, new_data) вызывается в фоновом потоке после каждой подмены снимка
+        """
+        self._listeners.append(callback)
+
+    def refresh(self):
+        """
+        Синхронизирует снимок с сервером, сохраняет его на диск и подменяет в памяти
+        """
+        with self._refresh_lock:
+            try:
+                data = delta_sync.sync_data(self.filename, on_error=self.on_error)
+                # Пустой список клиник - сервер не ответил; такой снимок не сохраняем и не подменяем
+                if not data["clinics"]:
+                    self.on_error("Snapshot refresh failed: no clinics received")
+                    return False
+                save_snapshot(data, self.filename)
+                if self.sections_file:
+                    shared_snapshot.publish(data, self.sections_file)
+                if self.sqlite_file:
+                    self.save_sqlite(self._data, data)
+            except Exception as e:
+                self.on_error(f"Snapshot refresh failed: {str(e)}")
+                return False
+
+            old_data = self._data
+            self._data = data
+            self.generation += 1
+
+        for callback in self._listeners:
+            try:
+                callback(old_data, data)
+            except Exception as e:
+                self.on_error(f"Snapshot listener failed: {str(e)}")
+        return True
+
+    def next_delay(self):
+        return max(0, self.interval + random.uniform(-self.jitter, self.jitter))
+
+    def _run(self):
+        while not self._stop.wait(self.next_delay()):
+            self.refresh()
+
+    def start(self, refresh_now=False):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        if refresh_now:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        self._thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,395 @@
+import json
+import os
+import sqlite3
+import threading
+import doctors_model
+import snapshot_format
+
+# Локальное хранилище снимка в SQLite вместо одного большого results.json.
+# Каждая сущность хранится строкой таблицы: индексируемые поля в отдельных столбцах,
+# исходный объект целиком в столбце data. Читатели получают ровно те строки,
+# которые им нужны, без разбора всего снимка
+
+DB_FILE = "results.db"
+JSON_FILE = "results.json"
+# Переменная окружения с явным источником данных для читателей (results.db или results.json)
+DATA_FILE_ENV = "DOCTORS_DATA_FILE"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS doctor_types (
+    id TEXT PRIMARY KEY,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS doctors (
+    id TEXT PRIMARY KEY,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS customers (
+    id TEXT PRIMARY KEY,
+    insurance_policy_number TEXT,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_customers_policy ON customers(insurance_policy_number);
+
+CREATE TABLE IF NOT EXISTS clinics (
+    id TEXT PRIMARY KEY,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clinic_offices (
+    id TEXT PRIMARY KEY,
+    clinic_id TEXT NOT NULL,
+    office_number TEXT,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_offices_clinic ON clinic_offices(clinic_id, office_number);
+
+CREATE TABLE IF NOT EXISTS clinic_doctors (
+    id TEXT PRIMARY KEY,
+    clinic_id TEXT NOT NULL,
+    specialty TEXT,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clinic_doctors_specialty ON clinic_doctors(clinic_id, specialty);
+
+CREATE TABLE IF NOT EXISTS doctor_availability (
+    id TEXT PRIMARY KEY,
+    clinic_doctor_id TEXT NOT NULL,
+    begin_date TEXT,
+    end_date TEXT,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_availability_doctor ON doctor_availability(clinic_doctor_id, begin_date);
+
+CREATE TABLE IF NOT EXISTS appointments (
+    id TEXT PRIMARY KEY,
+    clinic_id TEXT NOT NULL,
+    clinic_doctor_id TEXT,
+    clinic_office_id TEXT,
+    begin_date TEXT,
+    end_date TEXT,
+    position INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_appointments_clinic ON appointments(clinic_id, position);
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor ON appointments(clinic_doctor_id, begin_date);
+CREATE INDEX IF NOT EXISTS idx_appointments_office ON appointments(clinic_office_id, begin_date);
+"""
+
+TABLES = ("doctor_types", "doctors", "customers", "clinics", "clinic_offices", "clinic_doctors",
+          "doctor_availability", "appointments")
+
+
+def dump(item):
+    return json.dumps(item, ensure_ascii=False)
+
+
+class SqliteStore:
+    """
+    Хранилище снимка в SQLite. Методы чтения повторяют doctors_model.DoctorsData,
+    поэтому хранилище можно передавать туда же, куда и модель в памяти
+    """
+
+    def __init__(self, filename=DB_FILE):
+        self.filename = filename
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    # Запись
+
+    def write(self, statements):
+        """
+        Выполняет пакет операций [(sql, rows)] одной транзакцией
+        """
+        with self._lock, self._conn:
+            for sql, rows in statements:
+                self._conn.executemany(sql, rows)
+
+    def upsert_statement(self, table, columns, rows):
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "id")
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+               f"ON CONFLICT(id) DO UPDATE SET {updates}")
+        return sql, rows
+
+    def doctor_types_statement(self, doctor_types):
+        return self.upsert_statement("doctor_types", ("id", "position", "data"),
+                                     [(item['id'], i, dump(item)) for i, item in enumerate(doctor_types)])
+
+    def doctors_statement(self, doctors):
+        return self.upsert_statement("doctors", ("id", "position", "data"),
+                                     [(item['id'], i, dump(item)) for i, item in enumerate(doctors)])
+
+    def customers_statement(self, customers):
+        return self.upsert_statement("customers", ("id", "insurance_policy_number", "position", "data"),
+                                     [(item['id'], item.get('insurancePolicyNumber'), i, dump(item))
+                                      for i, item in enumerate(customers)])
+
+    def clinics_statement(self, clinics):
+        return self.upsert_statement("clinics", ("id", "position", "data"),
+                                     [(item['id'], i, dump(item)) for i, item in enumerate(clinics)])
+
+    def clinic_offices_statement(self, clinic_id, offices):
+        return self.upsert_statement("clinic_offices", ("id", "clinic_id", "office_number", "position", "data"),
+                                     [(item['id'], clinic_id, item.get('officeNumber'), i, dump(item))
+                                      for i, item in enumerate(offices)])
+
+    def clinic_doctors_statement(self, clinic_id, clinic_doctors):
+        return self.upsert_statement("clinic_doctors", ("id", "clinic_id", "specialty", "position", "data"),
+                                     [(item['id'], clinic_id, doctors_model.clinic_doctor_specialty(item), i,
+                                       dump(item))
+                                      for i, item in enumerate(clinic_doctors)])
+
+    def doctor_schedule_statements(self, clinic_doctor_id, schedule):
+        # Свободные окна врача заменяются целиком: старые окна за период больше не актуальны
+        return [
+            ("DELETE FROM doctor_availability WHERE clinic_doctor_id = ?", [(clinic_doctor_id,)]),
+            self.upsert_statement("doctor_availability",
+                                  ("id", "clinic_doctor_id", "begin_date", "end_date", "position", "data"),
+                                  [(item['id'], clinic_doctor_id, item.get('beginDate'), item.get('endDate'), i,
+                                    dump(item))
+                                   for i, item in enumerate(schedule)]),
+        ]
+
+    def appointments_statement(self, clinic_id, appointments):
+        return self.upsert_statement("appointments",
+                                     ("id", "clinic_id", "clinic_doctor_id", "clinic_office_id", "begin_date",
+                                      "end_date", "position", "data"),
+                                     [(item['id'], clinic_id, (item.get('clinicDoctor') or {}).get('id'),
+                                       (item.get('clinicOffice') or {}).get('id'), item.get('beginDate'),
+                                       item.get('endDate'), i, dump(item))
+                                      for i, item in enumerate(appointments)])
+
+    def snapshot_rows(self, data):
+        """
+        Строки всех таблиц снимка data: {таблица: (sql upsert, строки)}
+        """
+        statements = [
+            ("doctor_types", self.doctor_types_statement(data.get("doctor_types", []))),
+            ("doctors", self.doctors_statement(data.get("doctors", []))),
+            ("customers", self.customers_statement(data.get("customers", []))),
+            ("clinics", self.clinics_statement(data.get("clinics", []))),
+        ]
+        for clinic_id, offices in data.get("clinic_offices", {}).items():
+            statements.append(("clinic_offices", self.clinic_offices_statement(clinic_id, offices)))
+        for clinic_id, clinic_doctors in data.get("clinic_doctors", {}).items():
+            statements.append(("clinic_doctors", self.clinic_doctors_statement(clinic_id, clinic_doctors)))
+        for clinic_doctor_id, schedule in data.get("doctor_schedules", {}).items():
+            statements.append(("doctor_availability", self.doctor_schedule_statements(clinic_doctor_id, schedule)[1]))
+        for clinic_id, appointments in data.get("appointments", {}).items():
+            statements.append(("appointments", self.appointments_statement(clinic_id, appointments)))
+
+        tables = {table: (None, []) for table in TABLES}
+        for table, (sql, rows) in statements:
+            tables[table] = (sql, tables[table][1] + rows)
+        return tables
+
+    def save_changes(self, previous, data):
+        """
+        Переносит в базу изменения снимка data относительно previous, который уже лежит в базе:
+        новые и измененные строки записываются пакетными upsert'ами, исчезнувшие удаляются,
+        остальные строки не трогаются. Все изменения - одной транзакцией
+        """
+        old_tables = self.snapshot_rows(previous)
+        statements = []
+        for table, (sql, rows) in self.snapshot_rows(data).items():
+            old_rows = {row[0]: row for row in old_tables[table][1]}
+            ids = {row[0] for row in rows}
+            removed = [(row_id,) for row_id in old_rows if row_id not in ids]
+            changed = [row for row in rows if old_rows.get(row[0]) != row]
+            if removed:
+                statements.append((f"DELETE FROM {table} WHERE id = ?", removed))
+            if changed:
+                statements.append((sql, changed))
+        self.write(statements)
+        return sum(len(rows) for _, rows in statements)
+
+    def save_snapshot(self, data):
+        """
+        Заменяет содержимое хранилища снимком data (структура collect_all_data) одной транзакцией
+        """
+        statements = [(f"DELETE FROM {table}", [()]) for table in TABLES]
+        statements.append(self.doctor_types_statement(data.get("doctor_types", [])))
+        statements.append(self.doctors_statement(data.get("doctors", [])))
+        statements.append(self.customers_statement(data.get("customers", [])))
+        statements.append(self.clinics_statement(data.get("clinics", [])))
+        for clinic_id, offices in data.get("clinic_offices", {}).items():
+            statements.append(self.clinic_offices_statement(clinic_id, offices))
+        for clinic_id, clinic_doctors in data.get("clinic_doctors", {}).items():
+            statements.append(self.clinic_doctors_statement(clinic_id, clinic_doctors))
+        for clinic_doctor_id, schedule in data.get("doctor_schedules", {}).items():
+            statements.extend(self.doctor_schedule_statements(clinic_doctor_id, schedule))
+        for clinic_id, appointments in data.get("appointments", {}).items():
+            statements.append(self.appointments_statement(clinic_id, appointments))
+        self.write(statements)
+
+    # Чтение
+
+    def select(self, sql, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def select_one(self, sql, params=()):
+        rows = self.select(sql + " LIMIT 1", params)
+        return rows[0] if rows else None
+
+    @property
+    def clinics(self):
+        return self.select("SELECT data FROM clinics ORDER BY position")
+
+    def clinic(self, clinic_id):
+        return self.select_one("SELECT data FROM clinics WHERE id = ?", (clinic_id,))
+
+    def clinic_at(self, number):
+        """
+        Клиника по порядковому номеру в списке, начиная с 1
+        """
+        if not str(number or '').isdigit():
+            return None
+        rows = self.select("SELECT data FROM clinics ORDER BY position LIMIT 1 OFFSET ?", (int(number) - 1,))
+        return rows[0] if rows else None
+
+    def offices(self, clinic_id):
+        return self.select("SELECT data FROM clinic_offices WHERE clinic_id = ? ORDER BY position", (clinic_id,))
+
+    def office(self, clinic_id, office_number):
+        return self.select_one("SELECT data FROM clinic_offices WHERE clinic_id = ? AND office_number = ?",
+                               (clinic_id, office_number))
+
+    def clinic_doctors(self, clinic_id):
+        return self.select("SELECT data FROM clinic_doctors WHERE clinic_id = ? ORDER BY position", (clinic_id,))
+
+    def specialties(self, clinic_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT specialty FROM clinic_doctors WHERE clinic_id = ? GROUP BY specialty ORDER BY MIN(position)",
+                (clinic_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def doctors_with_specialty(self, clinic_id, specialty):
+        return self.select("SELECT data FROM clinic_doctors WHERE clinic_id = ? AND specialty = ? ORDER BY position",
+                           (clinic_id, specialty))
+
+    def customer(self, insurance_policy_number):
+        # При повторяющемся номере полиса берем последнего клиента, как и модель в памяти
+        return self.select_one("SELECT data FROM customers WHERE insurance_policy_number = ? ORDER BY position DESC",
+                               (insurance_policy_number,))
+
+    def schedule(self, clinic_doctor_id):
+        return self.select("SELECT data FROM doctor_availability WHERE clinic_doctor_id = ? ORDER BY position",
+                           (clinic_doctor_id,))
+
+    def doctor_appointments(self, clinic_doctor_id, date_from=None, date_to=None):
+        sql, params = "SELECT data FROM appointments WHERE clinic_doctor_id = ?", [clinic_doctor_id]
+        if date_from is not None:
+            sql += " AND end_date >= ?"
+            params.append(date_from.isoformat())
+        if date_to is not None:
+            sql += " AND begin_date <= ?"
+            params.append(date_to.isoformat())
+        return self.select(sql + " ORDER BY begin_date", params)
+
+    def office_appointments(self, office_id):
+        return self.select("SELECT data FROM appointments WHERE clinic_office_id = ? ORDER BY begin_date",
+                           (office_id,))
+
+    def to_snapshot(self):
+        """
+        Восстанавливает снимок в формате results.json
+        """
+        clinics = self.clinics
+        data = {
+            "doctor_types": self.select("SELECT data FROM doctor_types ORDER BY position"),
+            "doctors": self.select("SELECT data FROM doctors ORDER BY position"),
+            "customers": self.select("SELECT data FROM customers ORDER BY position"),
+            "clinics": clinics,
+            "clinic_offices": {},
+            "clinic_doctors": {},
+            "doctor_schedules": {},
+            "appointments": {}
+        }
+        for clinic in clinics:
+            clinic_id = clinic['id']
+            data["clinic_offices"][clinic_id] = self.offices(clinic_id)
+            data["clinic_doctors"][clinic_id] = self.clinic_doctors(clinic_id)
+            for clinic_doctor in data["clinic_doctors"][clinic_id]:
+                data["doctor_schedules"][clinic_doctor['id']] = self.schedule(clinic_doctor['id'])
+            data["appointments"][clinic_id] = self.select(
+                "SELECT data FROM appointments WHERE clinic_id = ? ORDER BY position", (clinic_id,))
+        return data
+
+
+def modified_time(filename):
+    """
+    Время последней записи файла; для базы учитывается и журнал WAL, куда попадают свежие транзакции
+    """
+    # Пустой журнал создает любой читатель при открытии базы, он не означает новой записи
+    times = [os.path.getmtime(name) for name in (filename, filename + "-wal")
+             if os.path.exists(name) and (name == filename or os.path.getsize(name))]
+    return max(times) if times else None
+
+
+def data_file(json_file=JSON_FILE, db_file=DB_FILE):
+    """
+    Источник данных для читателей: файл из DOCTORS_DATA_FILE, иначе более свежий из results.db и results.json.
+    Обход без --sqlite обновляет только results.json, и устаревшая база не должна его перекрывать
+    """
+    if os.environ.get(DATA_FILE_ENV):
+        return os.environ[DATA_FILE_ENV]
+    db_time = modified_time(db_file)
+    if db_time is None:
+        return json_file
+    json_time = modified_time(json_file)
+    return db_file if json_time is None or db_time >= json_time else json_file
+
+
+def is_sqlite(filename):
+    return filename.endswith('.db')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(filename=DB_FILE):
+    """
+    Одно соединение на файл базы на весь процесс
+    """
+    with _stores_lock:
+        if filename not in _stores:
+            _stores[filename] = SqliteStore(filename)
+        return _stores[filename]
+
+
+def open_model(filename=None):
+    """
+    Модель для выборок: SqliteStore отдает только нужные строки по индексам,
+    снимок JSON разбирается целиком в doctors_model.DoctorsData
+    """
+    filename = filename or data_file()
+    if is_sqlite(filename):
+        return get_store(filename)
+    return doctors_model.get_model(snapshot_format.load(filename))
+
+
+def load_snapshot(filename=None):
+    """
+    Снимок целиком в формате results.json из базы или из файла JSON
+    """
+    filename = filename or data_file()
+    if is_sqlite(filename):
+        return get_store(filename).to_snapshot()
+    return snapshot_format.load(filename)
@@ -0,0 +1,156 @@
+import base64
+import bisect
+import json
+from doctors_model import id_key
+
+# Индексы и постраничная выдача для JSON API веб-приложения (/api/...).
+# Индексы строятся один раз на снимок поверх doctors_model.DoctorsData или SectionedDoctorsData;
+# свободные окна врача берутся из модели при запросе и отдельно не индексируются. Страницы выдаются
+# по курсору: курсор - ключ сортировки последнего элемента страницы, следующая страница
+# начинается сразу после него, поэтому выдача стабильна, даже если снимок обновился между запросами
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Ключ из курсора; ValueError, если курсор поврежден
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def parse_fields(fields):
+    return [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+
+
+def select_fields(item, fields):
+    if not fields:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+class SortedItems:
+    """
+    Список элементов, отсортированный по ключу, с выдачей страниц по курсору
+    """
+
+    def __init__(self, items, key):
+        pairs = sorted(((key(item), item) for item in items), key=lambda pair: pair[0])
+        self.keys = [pair[0] for pair in pairs]
+        self.items = [pair[1] for pair in pairs]
+
+    def __len__(self):
+        return len(self.items)
+
+    def page(self, cursor=None, limit=DEFAULT_LIMIT, fields=None):
+        limit = max(1, min(limit, MAX_LIMIT))
+        try:
+            start = bisect.bisect_right(self.keys, decode_cursor(cursor)) if cursor else 0
+        except TypeError:
+            # Курсор от другого списка с другим ключом сортировки
+            raise ValueError("Invalid cursor")
+        items = self.items[start:start + limit]
+        has_more = start + limit < len(self.items)
+        return {
+            "items": [select_fields(item, fields) for item in items],
+            "next_cursor": encode_cursor(self.keys[start + limit - 1]) if has_more else None,
+        }
+
+
+def entity_key(item):
+    return list(id_key(item['id']))
+
+
+def slot_key(item):
+    return [item['begin_date'] or '', item['id']]
+
+
+def office_item(office):
+    return {
+        "id": office['id'],
+        "clinic_id": (office.get('clinic') or {}).get('id'),
+        "office_number": office.get('officeNumber'),
+    }
+
+
+def slot_item(row):
+    office = row.get('clinicOffice') or {}
+    return {
+        "id": row['id'],
+        "begin_date": row.get('beginDate'),
+        "end_date": row.get('endDate'),
+        "office_id": office.get('id'),
+        "office_number": office.get('officeNumber'),
+    }
+
+
+class ApiIndex:
+    def __init__(self, model):
+        self.model = model
+
+        cards = model.doctor_cards
+        self.all_doctors = SortedItems(cards, entity_key)
+        by_clinic = {}
+        by_specialty = {}
+        by_clinic_specialty = {}
+        for card in cards:
+            by_clinic.setdefault(card['clinic_id'], []).append(card)
+            by_specialty.setdefault(card['specialization'], []).append(card)
+            by_clinic_specialty.setdefault((card['clinic_id'], card['specialization']), []).append(card)
+        self.doctors_by_clinic = {key: SortedItems(items, entity_key) for key, items in by_clinic.items()}
+        self.doctors_by_specialty = {key: SortedItems(items, entity_key) for key, items in by_specialty.items()}
+        self.doctors_by_clinic_specialty = {
+            key: SortedItems(items, entity_key) for key, items in by_clinic_specialty.items()
+        }
+
+        self.doctor_ids = {card['id'] for card in cards}
+
+        self.clinics = SortedItems([
+            {"id": clinic['id'], "name": clinic.get('name'), "number": str(i + 1)}
+            for i, clinic in enumerate(model.clinics)
+        ], entity_key)
+        self.clinic_ids = {clinic['id'] for clinic in model.clinics}
+        self.offices_by_clinic = {
+            clinic_id: SortedItems([office_item(office) for office in offices], entity_key)
+            for clinic_id, offices in model.offices_by_clinic.items()
+        }
+
+    def doctors(self, clinic_id=None, specialty=None):
+        if clinic_id and specialty:
+            return self.doctors_by_clinic_specialty.get((clinic_id, specialty), SortedItems([], entity_key))
+        if clinic_id:
+            return self.doctors_by_clinic.get(clinic_id, SortedItems([], entity_key))
+        if specialty:
+            return self.doctors_by_specialty.get(specialty, SortedItems([], entity_key))
+        return self.all_doctors
+
+    def offices(self, clinic_id):
+        """
+        Кабинеты клиники; None, если клиники нет в снимке
+        """
+        if clinic_id not in self.clinic_ids:
+            return None
+        return self.offices_by_clinic.get(clinic_id, SortedItems([], entity_key))
+
+    def availability(self, clinic_doctor_id, date_from=None, date_to=None):
+        """
+        Свободные окна врача клиники, пересекающиеся с периодом; None, если врача нет в снимке
+        """
+        if clinic_doctor_id not in self.doctor_ids:
+            return None
+        return SortedItems([
+            slot for slot in (slot_item(row) for row in self.model.schedule(clinic_doctor_id))
+            if (date_from is None or (slot['end_date'] or '') >= date_from)
+            and (date_to is None or (slot['begin_date'] or '') <= date_to)
+        ], slot_key)
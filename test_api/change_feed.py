@@ -0,0 +1,103 @@
+import asyncio
+import json
+from collections import deque
+from snapshot_cache import SnapshotCache
+from snapshot_diff import snapshot_changes
+
+# Лента изменений данных для Server-Sent Events (/events). Фоновая задача раз в POLL_INTERVAL
+# секунд проверяет файлы снимка (несколько вызовов stat), при изменении загружает новый снимок
+# в отдельном потоке, сравнивает с предыдущим (snapshot_diff) и рассылает события подписчикам.
+# Задача запускается с первым подписчиком. Последние события хранятся, чтобы клиент после
+# переподключения с заголовком Last-Event-ID получил пропущенные
+
+POLL_INTERVAL = 5
+# Сколько последних событий хранить для переподключившихся клиентов
+HISTORY_SIZE = 500
+# Очередь медленного клиента; при переполнении его поток закрывается, браузер переподключится
+QUEUE_SIZE = 1000
+# Период комментария keep-alive в потоке событий, в секундах
+KEEPALIVE_INTERVAL = 15
+
+
+def format_event(event_id, event):
+    data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+class ChangeFeed:
+    def __init__(self, load, *filenames, interval=POLL_INTERVAL):
+        self.snapshots = SnapshotCache(load, *filenames)
+        self.interval = interval
+        self.last_event_id = 0
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self._subscribers = set()
+        self._task = None
+
+    def ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        version, data = None, None
+        while True:
+            try:
+                new_version, new_data = await self.snapshots.aentry()
+                if new_version == version:
+                    await asyncio.sleep(self.interval)
+                    continue
+                # Первый загруженный снимок - точка отсчета, событий по нему нет
+                events = await asyncio.to_thread(snapshot_changes, data, new_data) if data is not None else []
+            except Exception as e:
+                print(f"Change feed error: {str(e)}")
+                await asyncio.sleep(self.interval)
+                continue
+            version, data = new_version, new_data
+            self.publish(events)
+            await asyncio.sleep(self.interval)
+
+    def publish(self, events):
+        for event in events:
+            self.last_event_id += 1
+            item = (self.last_event_id, event)
+            self.history.append(item)
+            for queue in list(self._subscribers):
+                try:
+                    queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    # Клиент не успевает читать: закрываем его поток
+                    self._subscribers.discard(queue)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Очередь событий нового подписчика; при переподключении в нее сразу попадают пропущенные события
+        """
+        self.ensure_started()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if last_event_id is not None:
+            for item in self.history:
+                if item[0] > last_event_id and not queue.full():
+                    queue.put_nowait(item)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def stream(self, request, last_event_id=None):
+        """
+        Поток событий в формате text/event-stream до отключения клиента
+        """
+        queue = self.subscribe(last_event_id)
+        try:
+            yield f"retry: {int(self.interval * 1000)}\n\n"
+            while queue in self._subscribers or not queue.empty():
+                if await request.is_disconnected():
+                    break
+                try:
+                    event_id, event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event_id, event)
+        finally:
+            self.unsubscribe(queue)
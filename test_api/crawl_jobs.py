@@ -0,0 +1,103 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Фоновые задачи обновления данных с сервера для веб-приложения. Обход выполняется
+# в отдельном потоке, обработчик запроса сразу получает id задачи и может опрашивать ее статус.
+# Пока одна задача выполняется, новые запросы получают ее же, а не запускают второй обход.
+# Кроме статуса задача сообщает этап обхода (phase), который передает сама функция обхода
+
+# Сколько завершенных задач помнить для запросов статуса
+MAX_JOBS = 20
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Этапы: до запуска обхода и после его успешного завершения; промежуточные задает функция обхода
+QUEUED = "queued"
+FINISHED = "done"
+
+
+class CrawlJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = PENDING
+        self.phase = QUEUED
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def to_dict(self):
+        def iso(value):
+            return value.isoformat() if value else None
+
+        end = self.finished_at or datetime.now()
+        return {
+            "id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "created_at": iso(self.created_at),
+            "started_at": iso(self.started_at),
+            "finished_at": iso(self.finished_at),
+            "elapsed": round((end - self.started_at).total_seconds(), 1) if self.started_at else 0,
+            "error": self.error,
+        }
+
+
+class CrawlJobs:
+    def __init__(self, run, max_jobs=MAX_JOBS):
+        # run(on_phase=...) выполняет обход, сообщая этапы через on_phase, и возвращает None, если он не удался
+        self.run = run
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._current = None
+
+    def start(self):
+        """
+        Запускает обход или возвращает уже выполняющуюся задачу
+        """
+        with self._lock:
+            if self._current is not None and not self._current.finished:
+                return self._current
+            job = CrawlJob()
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+            self._current = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        job.started_at = datetime.now()
+        job.status = RUNNING
+        try:
+            ok = self.run(on_phase=job.set_phase) is not None
+            job.error = None if ok else "crawl failed"
+        except Exception as e:
+            ok = False
+            job.error = str(e)
+        # При ошибке остается этап, на котором обход остановился
+        if ok:
+            job.phase = FINISHED
+        job.finished_at = datetime.now()
+        job.status = DONE if ok else FAILED
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
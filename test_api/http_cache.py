@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# HTTP кэширование страниц и статики: сильные ETag, Last-Modified, ответ 304 на условные
+# запросы без рендеринга и заранее сжатые (gzip, brotli - если установлен) тела ответов.
+# У каждого сжатого варианта свой ETag (к базовому добавляется кодировка), а при проверке
+# If-None-Match подходит любой вариант того же базового ETag
+
+# Меньшие тела не сжимаем - выигрыша почти нет
+MIN_COMPRESS_SIZE = 256
+
+
+def etag_for(*parts):
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def http_date(timestamp):
+    return formatdate(timestamp, usegmt=True)
+
+
+def variant_etag(etag, encoding):
+    return etag if encoding == "identity" else etag[:-1] + "-" + encoding + '"'
+
+
+def base_etag(etag):
+    etag = etag.strip()
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for encoding in ("gzip", "br"):
+        suffix = "-" + encoding + '"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def not_modified(request_headers, etag, last_modified=None):
+    """
+    Проверка условного запроса: If-None-Match важнее If-Modified-Since
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or base_etag(etag) in [base_etag(tag) for tag in tags]
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= int(last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def accepted_encodings(request_headers):
+    accepted = set()
+    for part in request_headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def compress(body):
+    """
+    Варианты тела по кодировкам; сжатый вариант остается, только если он меньше исходного
+    """
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_SIZE:
+        return variants
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(compressed) < len(body):
+        variants["gzip"] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(body)
+        if len(compressed) < len(body):
+            variants["br"] = compressed
+    return variants
+
+
+def choose_encoding(variants, request_headers):
+    accepted = accepted_encodings(request_headers)
+    for encoding in ("br", "gzip"):
+        if encoding in variants and encoding in accepted:
+            return encoding
+    return "identity"
+
+
+def cache_headers(etag, last_modified=None, encoding="identity"):
+    headers = {"ETag": variant_etag(etag, encoding), "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return headers
+
+
+class CachedBody:
+    def __init__(self, body, media_type, etag, last_modified=None):
+        self.variants = compress(body)
+        self.media_type = media_type
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def response(self, request_headers):
+        encoding = choose_encoding(self.variants, request_headers)
+        return Response(self.variants[encoding], media_type=self.media_type,
+                        headers=cache_headers(self.etag, self.last_modified, encoding))
+
+
+def not_modified_response(etag, last_modified=None):
+    headers = cache_headers(etag, last_modified)
+    return Response(status_code=304, headers=headers)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, который отдает сжатые варианты файлов; варианты сжимаются один раз
+    на версию файла (путь, время изменения, размер) и хранятся в памяти
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def variants(self, full_path, stat_result):
+        key = (str(full_path), stat_result.st_mtime_ns, stat_result.st_size)
+        with self._lock:
+            variants = self._bodies.get(key)
+        if variants is None:
+            with open(full_path, 'rb') as f:
+                variants = compress(f.read())
+            with self._lock:
+                self._bodies = {k: v for k, v in self._bodies.items() if k[0] != key[0]}
+                self._bodies[key] = variants
+        return variants
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get("headers", [])
+        }
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        etag = response.headers["etag"]
+        if status_code == 200 and not_modified(request_headers, etag, stat_result.st_mtime):
+            return not_modified_response(etag, stat_result.st_mtime)
+        response.headers["Vary"] = "Accept-Encoding"
+        if status_code != 200 or not accepted_encodings(request_headers) & {"gzip", "br"}:
+            return response
+
+        variants = self.variants(full_path, stat_result)
+        encoding = choose_encoding(variants, request_headers)
+        if encoding == "identity":
+            return response
+        return Response(variants[encoding], media_type=response.media_type,
+                        headers=cache_headers(etag, stat_result.st_mtime, encoding))
@@ -1,17 +1,48 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+import os
+import sys
+
+# Общие модули (клиент GraphQL, обход сервера, модель и форматы снимка) лежат в корне
+# репозитория, веб-приложение импортирует их оттуда, а не держит свои копии
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-import json
+from doctors_model import SectionedDoctorsData, load_model, doctor_cards
+from api_index import ApiIndex, DEFAULT_LIMIT, MAX_LIMIT, parse_fields
+from shared_snapshot import SharedSnapshot, file_id
+from snapshot_cache import SnapshotCache, last_modified
+from render_cache import TemplateCache
+from http_cache import CachedBody, PrecompressedStaticFiles, cache_headers, etag_for, not_modified, \
+    not_modified_response
+from crawl_jobs import CrawlJobs
+from change_feed import ChangeFeed
+import snapshot_format
 from vivod import main  # Убедитесь, что функция main существует в vivod.py
 
 app = FastAPI()
 
+# Снимок по разделам, общий для всех воркеров: каждый отображает один и тот же файл results.snap
+shared_snapshot = SharedSnapshot("results.snap")
+
+
+def current_snapshot():
+    """
+    Общий снимок по разделам, если он не старше results.json, иначе None.
+    Обход без --sections обновляет только results.json, и тогда читать нужно его
+    """
+    snapshot = shared_snapshot.current()
+    snap_id, json_id = file_id("results.snap"), file_id("results.json")
+    if snapshot is None or snap_id is None or (json_id is not None and json_id[2] > snap_id[2]):
+        return None
+    return snapshot
+
 # Настройка для работы с шаблонами
 templates = Jinja2Templates(directory="templates")
 
 # Настройка статических файлов
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Статика отдается с ETag/Last-Modified и заранее сжатыми вариантами (gzip, brotli)
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -24,26 +55,136 @@ async def dashboard(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
 
+# Обновление данных с сервера (функция main из vivod.py) идет в фоне, одновременно не больше одного.
+# Обход публикует и results.snap, из которого читают страницы и API, иначе они остались бы на старом снимке
+crawl_jobs = CrawlJobs(lambda on_phase: main(sections_file="results.snap", on_phase=on_phase))
+
+
 @app.get("/login", response_class=HTMLResponse)
 async def login(request: Request):
-    main()  # Вызов функции main из vivod.py
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    job = crawl_jobs.start()
+    return templates.TemplateResponse("dashboard.html", {"request": request, "job_id": job.id})
+
+
+@app.get("/login/status/{job_id}")
+async def login_status(job_id: str):
+    job = crawl_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+def load_doctor_cards():
+    # Из общего снимка по разделам читаем только clinic_doctors, иначе разбираем results.json целиком
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return doctor_cards(snapshot.section("clinic_doctors", {}))
+    return load_model("results.json").doctor_cards
+
+
+# Плоский список врачей пересчитывается только при изменении файлов снимка
+doctors_cache = SnapshotCache(load_doctor_cards, "results.snap", "results.json")
+
+
+# Отрендеренные страницы и фрагменты, по одному рендерингу на версию снимка
+render_cache = TemplateCache(templates.env)
 
 
 @app.get("/doctors", response_class=HTMLResponse)
 async def get_doctors(request: Request):
-    with open("results.json", "r", encoding="utf-8") as file:
-        data = json.load(file)
-
-    doctors = []
-    for clinic_id, doctor_list in data.get("clinic_doctors", {}).items():
-        for doctor in doctor_list:
-            first_name = doctor["doctor"]["entity"]["person"]["entity"]["firstName"]
-            last_name = doctor["doctor"]["entity"]["person"]["entity"]["lastName"]
-            specialization = doctor["doctor"]["entity"]["doctorType"]["name"]
-            doctors.append({"first_name": first_name, "last_name": last_name, "specialization": specialization})
-
-    return templates.TemplateResponse("doctors.html", {"request": request, "doctors": doctors})
+    # Страница зависит только от снимка: ETag - версия файлов снимка, повторный запрос получает 304
+    version, doctors = await doctors_cache.aentry()
+    etag = etag_for("doctors.html", version)
+    modified = last_modified(version)
+    if not_modified(request.headers, etag, modified):
+        return not_modified_response(etag, modified)
+
+    doctor_list = render_cache.fragment("doctor_list.html", version, {"doctors": doctors})
+    page = render_cache.page(
+        "doctors.html", version, {"request": request, "doctor_list": doctor_list},
+        build=lambda html: CachedBody(html.encode('utf-8'), "text/html; charset=utf-8", etag, modified))
+    return page.response(request.headers)
+
+
+def load_api_index():
+    # Из общего снимка индексы строятся по нужным разделам, расписания читаются из файла при запросе
+    snapshot = current_snapshot()
+    model = SectionedDoctorsData(snapshot) if snapshot is not None else load_model("results.json")
+    return ApiIndex(model)
+
+
+# Индексы JSON API строятся один раз на снимок
+api_cache = SnapshotCache(load_api_index, "results.snap", "results.json")
+
+
+async def api_page(request, select, cursor, limit, fields):
+    """
+    Страница JSON API; ETag - версия снимка плюс путь и параметры запроса, повторный запрос получает 304
+    """
+    version, index = await api_cache.aentry()
+    etag = etag_for(request.url.path, str(request.query_params), version)
+    modified = last_modified(version)
+    if not_modified(request.headers, etag, modified):
+        return not_modified_response(etag, modified)
+
+    items = select(index)
+    if items is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        page = items.page(cursor, limit, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(page, headers=cache_headers(etag, modified))
+
+
+@app.get("/api/doctors")
+async def api_doctors(request: Request, clinic_id: str = None, specialty: str = None, fields: str = None,
+                      cursor: str = None, limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT)):
+    return await api_page(request, lambda index: index.doctors(clinic_id, specialty), cursor, limit, fields)
+
+
+@app.get("/api/clinics")
+async def api_clinics(request: Request, fields: str = None, cursor: str = None,
+                      limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT)):
+    return await api_page(request, lambda index: index.clinics, cursor, limit, fields)
+
+
+@app.get("/api/clinics/{clinic_id}/offices")
+async def api_clinic_offices(request: Request, clinic_id: str, fields: str = None, cursor: str = None,
+                             limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT)):
+    return await api_page(request, lambda index: index.offices(clinic_id), cursor, limit, fields)
+
+
+@app.get("/api/doctors/{doctor_id}/availability")
+async def api_doctor_availability(request: Request, doctor_id: str, date_from: str = None, date_to: str = None,
+                                  fields: str = None, cursor: str = None,
+                                  limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT)):
+    return await api_page(request, lambda index: index.availability(doctor_id, date_from, date_to),
+                          cursor, limit, fields)
+
+
+
+def load_snapshot_data():
+    # Общий снимок не копируется в память: лента сравнивает поколения по записям прямо в отображении
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot
+    try:
+        return snapshot_format.load("results.json")
+    except FileNotFoundError:
+        return None
+
+
+# События об изменениях данных: новые записи, освободившиеся окна, новые врачи
+change_feed = ChangeFeed(load_snapshot_data, "results.snap", "results.json")
+
+
+@app.get("/events")
+async def events(request: Request):
+    last_event_id = request.headers.get("last-event-id")
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(change_feed.stream(request, last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+import threading
+from collections import OrderedDict
+from markupsafe import Markup
+
+# Кэш отрендеренных шаблонов Jinja: целых страниц и фрагментов (частичных шаблонов).
+# Ключ - имя шаблона, дополнительный ключ фрагмента и версия данных (версия файлов снимка),
+# поэтому шаблон рендерится один раз на версию данных, а не на каждый запрос.
+# Когда приходит новая версия данных, записи старых версий удаляются; общий размер
+# кэша ограничен max_bytes, при переполнении вытесняются давно не использованные записи
+
+# Ограничение размера кэша в байтах
+MAX_BYTES = 8 * 1024 * 1024
+
+
+def value_size(value):
+    # Для сжатых страниц (http_cache.CachedBody) считаем все варианты тела
+    variants = getattr(value, 'variants', None)
+    if variants is not None:
+        return sum(len(body) for body in variants.values())
+    return len(value)
+
+
+class TemplateCache:
+    def __init__(self, templates, max_bytes=MAX_BYTES):
+        self.templates = templates
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.renders = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                # Данные обновились - прошлые версии страниц и фрагментов больше не нужны
+                self._entries.clear()
+                self.size = 0
+                self._version = version
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, version, value):
+        size = value_size(value)
+        with self._lock:
+            if version != self._version or size > self.max_bytes:
+                return value
+            if key in self._entries:
+                self.size -= value_size(self._entries[key])
+            self._entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= value_size(evicted)
+        return value
+
+    def render(self, name, context):
+        self.renders += 1
+        return self.templates.get_template(name).render(context)
+
+    def fragment(self, name, version, context, key=None):
+        """
+        Отрендеренный частичный шаблон для вставки в страницу
+        """
+        cache_key = ("fragment", name, key)
+        value = self._get(cache_key, version)
+        if value is None:
+            value = self._set(cache_key, version, Markup(self.render(name, context)))
+        return value
+
+    def page(self, name, version, context, build=None, key=None):
+        """
+        Отрендеренная страница; build(html) может превратить ее в готовое тело ответа
+        (например, в заранее сжатый http_cache.CachedBody), в кэше хранится результат build
+        """
+        cache_key = ("page", name, key)
+        value = self._get(cache_key, version)
+        if value is None:
+            html = self.render(name, context)
+            value = self._set(cache_key, version, build(html) if build else html)
+        return value
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from shared_snapshot import file_id
+
+# Кэш в памяти процесса для данных, вычисленных из файлов снимка (например, плоский список
+# врачей для /doctors). Данные пересчитываются, только если изменился один из файлов:
+# подмена файла меняет inode, перезапись - время изменения и размер, новое поколение
+# results.snap всегда записывается подменой. Проверка - несколько вызовов stat, поэтому
+# время ответа не зависит от размера снимка; сам пересчет в асинхронном коде идет в отдельном потоке
+
+
+def last_modified(key):
+    """
+    Время последнего изменения файлов снимка по ключу кэша, в секундах; None, если файлов нет
+    """
+    times = [item[2] for item in key if item is not None]
+    return max(times) / 1e9 if times else None
+
+
+class SnapshotCache:
+    def __init__(self, load, *filenames):
+        self.load = load
+        self.filenames = filenames
+        self.reloads = 0
+        self._lock = threading.Lock()
+        # Ключ (версия файлов) и значение меняются вместе, одним присваиванием
+        self._entry = (None, None)
+
+    def key(self):
+        return tuple(file_id(filename) for filename in self.filenames)
+
+    def _reload(self, key):
+        # Параллельные перезагрузки ждут первую и берут ее результат
+        with self._lock:
+            if key != self._entry[0]:
+                self._entry = (key, self.load())
+                self.reloads += 1
+            return self._entry
+
+    def entry(self):
+        """
+        Пара (версия файлов снимка, значение)
+        """
+        key = self.key()
+        entry = self._entry
+        if key == entry[0]:
+            return entry
+        return self._reload(key)
+
+    async def aentry(self):
+        """
+        То же, что entry(), но перезагрузка не блокирует цикл событий
+        """
+        key = self.key()
+        entry = self._entry
+        if key == entry[0]:
+            return entry
+        return await asyncio.to_thread(self._reload, key)
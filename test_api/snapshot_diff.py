@@ -0,0 +1,87 @@
+from doctors_model import clinic_doctor_name, clinic_doctor_specialty
+
+# Изменения между двумя последовательными снимками данных (результатами collect_all_data
+# или delta_sync) в виде компактных событий для живого обновления клиентов:
+# - appointment_added / appointment_removed - новые и исчезнувшие записи на прием;
+# - availability_added / availability_removed - появившиеся и освободившиеся окна врачей;
+# - doctor_added / doctor_removed - врачи клиник.
+# События сравниваются по id сущностей, в событие попадают только поля, нужные для отображения.
+# Снимки по разделам (sectioned_snapshot) сравниваются по записям: запись, байты которой
+# не изменились между поколениями, не разбирается
+
+
+def by_id(items):
+    return {item['id']: item for item in items if item.get('id')}
+
+
+def appointment_event(event_type, clinic_id, appointment):
+    return {
+        "type": event_type,
+        "clinic_id": clinic_id,
+        "id": appointment['id'],
+        "clinic_doctor_id": (appointment.get('clinicDoctor') or {}).get('id'),
+        "office_number": (appointment.get('clinicOffice') or {}).get('officeNumber'),
+        "begin_date": appointment.get('beginDate'),
+        "end_date": appointment.get('endDate'),
+    }
+
+
+def availability_event(event_type, clinic_doctor_id, slot):
+    return {
+        "type": event_type,
+        "clinic_doctor_id": clinic_doctor_id,
+        "id": slot['id'],
+        "office_number": (slot.get('clinicOffice') or {}).get('officeNumber'),
+        "begin_date": slot.get('beginDate'),
+        "end_date": slot.get('endDate'),
+    }
+
+
+def doctor_event(event_type, clinic_id, clinic_doctor):
+    first_name, last_name = clinic_doctor_name(clinic_doctor)
+    return {
+        "type": event_type,
+        "clinic_id": clinic_id,
+        "id": clinic_doctor['id'],
+        "first_name": first_name,
+        "last_name": last_name,
+        "specialization": clinic_doctor_specialty(clinic_doctor),
+    }
+
+
+def same_record(old_groups, new_groups, group_id):
+    if not (hasattr(old_groups, 'raw') and hasattr(new_groups, 'raw')):
+        return False
+    return group_id in old_groups and group_id in new_groups and old_groups.raw(group_id) == new_groups.raw(group_id)
+
+
+def diff_groups(old_groups, new_groups, make_event, added_type, removed_type):
+    events = []
+    for group_id in list(old_groups) + [group_id for group_id in new_groups if group_id not in old_groups]:
+        if same_record(old_groups, new_groups, group_id):
+            continue
+        old_items = by_id(old_groups.get(group_id) or [])
+        new_items = by_id(new_groups.get(group_id) or [])
+        for item_id, item in new_items.items():
+            if item_id not in old_items:
+                events.append(make_event(added_type, group_id, item))
+        for item_id, item in old_items.items():
+            if item_id not in new_items:
+                events.append(make_event(removed_type, group_id, item))
+    return events
+
+
+def snapshot_changes(old, new):
+    """
+    Список событий, превращающих снимок old в снимок new (словари results.json или SectionedSnapshot)
+    """
+    old = old or {}
+    new = new or {}
+    return (
+        diff_groups(old.get("clinic_doctors", {}), new.get("clinic_doctors", {}), doctor_event,
+                    "doctor_added", "doctor_removed")
+        + diff_groups(old.get("doctor_schedules", {}), new.get("doctor_schedules", {}), availability_event,
+                      "availability_added", "availability_removed")
+        + diff_groups(old.get("appointments", {}), new.get("appointments", {}), appointment_event,
+                      "appointment_added", "appointment_removed")
+    )
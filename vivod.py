@@ -1,6 +1,13 @@
-import requests
-from datetime import datetime, timedelta
+import graphql_client
+import queries
+import async_crawler
+import delta_sync
+import snapshot_format
+import shared_snapshot
+from sqlite_store import get_store
+from datetime import datetime
 import json
+import sys
 from colorama import init, Fore, Style
 from tabulate import tabulate
 
@@ -8,7 +15,7 @@ from tabulate import tabulate
 init()
 
 # URL GraphQL сервера
-url = "https://smapi.pv-api.sbc.space/ds-7429590172239724545/graphql"
+url = graphql_client.url
 
 def print_header(text):
     print(f"\n{Fore.BLUE}{'=' * 80}")
@@ -93,117 +100,23 @@ def format_clinic_offices(data):
     return tabulate(table_data, headers=['ID', 'Clinic', 'Office Number'], tablefmt='grid')
 
 def graphql_query(query, variables=None):
-    try:
-        json_data = {
-            'query': query,
-            'variables': variables or {}
-        }
-
-        print_info("Sending request...")
-
-        response = requests.post(url, json=json_data)
-
-        if response.status_code == 200:
-            result = response.json()
-            if 'errors' in result:
-                print_error(f"GraphQL Errors: {result['errors']}")
-                return None
-            return result.get('data')
-        else:
-            print_error(f"HTTP Error {response.status_code}: {response.text}")
-            return None
-
-    except Exception as e:
-        print_error(f"Exception occurred: {str(e)}")
-        return None
+    print_info("Sending request...")
+    return graphql_client.graphql_query(query, variables, on_error=print_error)
 
 def get_all_doctor_types():
-    query = """
-    query {
-      searchDoctorType(cond: "it.isDel == false") {
-        elems {
-          id
-          name
-          description
-        }
-      }
-    }
-    """
-    return graphql_query(query)
+    return graphql_query(*queries.doctor_types_query())
 
 def get_all_doctors():
-    query = """
-    query {
-      searchDoctor {
-        elems {
-          id
-          doctorType {
-            id
-            name
-          }
-          person {
-            entityId
-            entity {
-              firstName
-              lastName
-            }
-          }
-        }
-      }
-    }
-    """
-    return graphql_query(query)
+    return graphql_query(*queries.doctors_query())
 
 def get_all_customers():
-    query = """
-    query {
-      searchCustomer(cond: "1==1") {
-        elems {
-          id
-          insurancePolicyNumber
-          phoneNumber
-          person {
-            entityId
-            entity {
-              firstName
-              lastName
-            }
-          }
-        }
-      }
-    }
-    """
-    return graphql_query(query)
+    return graphql_query(*queries.customers_query())
 
 def get_all_clinics():
-    query = """
-    query {
-      searchClinic {
-        elems {
-          id
-          name
-        }
-      }
-    }
-    """
-    return graphql_query(query)
+    return graphql_query(*queries.clinics_query())
 
 def get_clinic_offices(clinic_id):
-    query = f"""
-    query {{
-      searchClinicOffice(cond: "it.clinic.id == '{clinic_id}'") {{
-        elems {{
-          id
-          clinic {{
-            id
-            name
-          }}
-          officeNumber
-        }}
-      }}
-    }}
-    """
-    return graphql_query(query)
+    return graphql_query(*queries.clinic_offices_query(clinic_id))
 
 
 
@@ -225,65 +138,11 @@ def format_doctor_availability(data):
 
 
 def get_doctor_availability(clinic_doctor_id, date_from=None, date_to=None):
-    if date_from is None:
-        date_from = datetime.now()
-    if date_to is None:
-        date_to = date_from + timedelta(days=7)
-
-    query = """
-    query searchClinicDoctorAvailability($clinicDoctorId: String!, $dateFrom: _DateTime!, $dateTo: _DateTime!) {
-        searchClinicDoctorAvailability(
-            cond: "it.clinicDoctor.id == ${clinicDoctorId} && it.endDate >= ${dateFrom} && it.beginDate <= ${dateTo}"
-        ) @strExpr(string:$clinicDoctorId, dateTimes:[$dateFrom, $dateTo]) {
-            elems {
-                id
-                beginDate
-                endDate
-                clinicOffice {
-                    id
-                    officeNumber
-                }
-            }
-        }
-    }
-    """
-
-    variables = {
-        "clinicDoctorId": clinic_doctor_id,
-        "dateFrom": date_from.isoformat(),
-        "dateTo": date_to.isoformat()
-    }
-
-    return graphql_query(query, variables)
+    return graphql_query(*queries.doctor_availability_query(clinic_doctor_id, date_from, date_to))
 
 
 def get_clinic_doctors(clinic_id):
-    query = """
-    query {
-        searchClinicDoctor(
-            cond: "it.clinic.id == '%s'"
-        ) {
-            elems {
-                id
-                doctor {
-                    entity {
-                        person {
-                            entity {
-                                firstName
-                                lastName
-                            }
-                        }
-                        doctorType {
-                            name
-                        }
-                    }
-                }
-            }
-        }
-    }
-    """ % clinic_id
-
-    return graphql_query(query)
+    return graphql_query(*queries.clinic_doctors_query(clinic_id))
 
 
 def format_clinic_doctors(data):
@@ -322,52 +181,8 @@ def format_clinic_tables(data):
     return tabulate(table_data, headers=['ID', 'Doctor Name', 'Customer Name', 'Begin Date', 'End Date', 'Office Number'], tablefmt='grid')
 
 
-def get_clinic_tables(clinic_id):
-    query = """
-    query {
-        searchClinicTable(cond: "it.clinic.id == '%s'") {
-            elems {
-                id
-                beginDate
-                endDate
-                clinicOffice {
-                    id
-                    officeNumber
-                }
-                customer {
-                    entity {
-                        person {
-                            entity {
-                                firstName
-                                lastName
-                            }
-                        }
-                        insurancePolicyNumber
-                        phoneNumber
-                    }
-                }
-                clinicDoctor {
-                    id
-                    doctor {
-                        entity {
-                            person {
-                                entity {
-                                    firstName
-                                    lastName
-                                }
-                            }
-                            doctorType {
-                                name
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    }
-    """ % clinic_id
-
-    return graphql_query(query)
+def get_clinic_tables(clinic_id, date_from=None, date_to=None, fields=queries.CLINIC_TABLE_SELECTION):
+    return graphql_query(*queries.clinic_tables_query(clinic_id, date_from, date_to, fields))
 
 
 def format_clinic_tables(data):
@@ -432,199 +247,124 @@ def save_to_json(data, filename):
         print_error(f"Error saving data to JSON: {str(e)}")
 
 
-def collect_all_data():
+def save_snapshot(data, filename):
+    """
+    Сохраняет снимок в нормализованном формате
+    """
+    try:
+        snapshot_format.save(data, filename)
+        print_success(f"Data successfully saved to {filename}")
+    except Exception as e:
+        print_error(f"Error saving data to JSON: {str(e)}")
+
+
+def print_report(data):
     """
-    Собирает все данные в единую структуру
+    Выводит отчет в консоль из уже собранных данных, без запросов к серверу
     """
-    data = {
-        "doctor_types": [],
-        "doctors": [],
-        "customers": [],
-        "clinics": [],
-        "clinic_offices": {},
-        "clinic_doctors": {},
-        "doctor_schedules": {},
-        "appointments": {}
-    }
-
-    # Получаем типы врачей
-    result = get_all_doctor_types()
-    if result and 'searchDoctorType' in result and 'elems' in result['searchDoctorType']:
-        data["doctor_types"] = result['searchDoctorType']['elems']
-
-    # Получаем врачей
-    result = get_all_doctors()
-    if result and 'searchDoctor' in result and 'elems' in result['searchDoctor']:
-        data["doctors"] = result['searchDoctor']['elems']
-
-    # Получаем клиентов
-    result = get_all_customers()
-    if result and 'searchCustomer' in result and 'elems' in result['searchCustomer']:
-        data["customers"] = result['searchCustomer']['elems']
-
-    # Получаем клиники и связанные данные
-    clinics_result = get_all_clinics()
-    if clinics_result and 'searchClinic' in clinics_result and 'elems' in clinics_result['searchClinic']:
-        data["clinics"] = clinics_result['searchClinic']['elems']
-
-        # Для каждой клиники получаем дополнительные данные
-        for clinic in clinics_result['searchClinic']['elems']:
-            clinic_id = clinic.get('id')
-            if clinic_id:
-                # Получаем кабинеты
-                offices_result = get_clinic_offices(clinic_id)
-                if offices_result and 'searchClinicOffice' in offices_result:
-                    data["clinic_offices"][clinic_id] = offices_result['searchClinicOffice']['elems']
-
-                # Получаем врачей клиники
-                doctors_result = get_clinic_doctors(clinic_id)
-                if doctors_result and 'searchClinicDoctor' in doctors_result:
-                    data["clinic_doctors"][clinic_id] = doctors_result['searchClinicDoctor']['elems']
-
-                    # Получаем расписание для каждого врача
-                    for clinic_doctor in doctors_result['searchClinicDoctor']['elems']:
-                        clinic_doctor_id = clinic_doctor.get('id')
-                        if clinic_doctor_id:
-                            availability_result = get_doctor_availability(clinic_doctor_id)
-                            if availability_result and 'searchClinicDoctorAvailability' in availability_result:
-                                data["doctor_schedules"][clinic_doctor_id] = \
-                                availability_result['searchClinicDoctorAvailability']['elems']
-
-                # Получаем записи к врачам
-                appointments_result = get_clinic_tables(clinic_id)
-                if appointments_result and 'searchClinicTable' in appointments_result:
-                    data["appointments"][clinic_id] = appointments_result['searchClinicTable']['elems']
-
-    return data
-
-def main():
+    print_header("Doctor Types")
+    print(format_doctor_types({'searchDoctorType': {'elems': data["doctor_types"]}}))
+
+    print_header("Doctors")
+    print(format_doctors({'searchDoctor': {'elems': data["doctors"]}}))
+
+    print_header("Customers")
+    print(format_customers({'searchCustomer': {'elems': data["customers"]}}))
+
+    print_header("Clinics")
+    print(format_clinics({'searchClinic': {'elems': data["clinics"]}}))
+
+    for clinic in data["clinics"]:
+        clinic_id = clinic.get('id')
+        if clinic_id in data["clinic_offices"]:
+            print_header(f"Offices for clinic: { clinic.get('name', 'Unknown')} ")
+            print(format_clinic_offices({'searchClinicOffice': {'elems': data["clinic_offices"][clinic_id]}}))
+
+    # Врачи клиник и их расписание
+    print_header("Doctors Schedule")
+    for clinic in data["clinics"]:
+        clinic_id = clinic.get('id')
+        if clinic_id not in data["clinic_doctors"]:
+            print_error(f"Failed to retrieve doctors for clinic: {clinic.get('name', 'Unknown')}")
+            continue
+
+        print_header(f"Doctors in clinic: {clinic.get('name', 'Unknown')} (ID: {clinic_id})")
+        clinic_doctors = data["clinic_doctors"][clinic_id]
+        if not clinic_doctors:
+            print_info("No doctors found for this clinic")
+            continue
+        print(format_clinic_doctors({'searchClinicDoctor': {'elems': clinic_doctors}}))
+
+        for clinic_doctor in clinic_doctors:
+            schedule = data["doctor_schedules"].get(clinic_doctor.get('id'))
+            if schedule:
+                person = clinic_doctor.get('doctor', {}).get('entity', {}).get('person', {}).get('entity', {})
+                print_header(f"Schedule for doctor: {person.get('firstName', '')} {person.get('lastName', '')}")
+                print(format_doctor_availability({'searchClinicDoctorAvailability': {'elems': schedule}}))
+
+    # Записи к врачам
+    for clinic in data["clinics"]:
+        clinic_id = clinic.get('id')
+        print_header(f"Appointments in clinic: {clinic.get('name', 'Unknown')}")
+        appointments = data["appointments"].get(clinic_id)
+        if appointments is None:
+            print_error("Failed to retrieve appointments")
+        elif appointments:
+            print(format_clinic_tables({'searchClinicTable': {'elems': appointments}}))
+        else:
+            print_info("No appointments found for this clinic")
+
+
+def main(incremental=False, sqlite_file=None, sections_file=None, on_phase=None):
+    # on_phase(name) сообщает, на каком этапе обновление: crawling - загрузка с сервера, saving - сохранение
+    on_phase = on_phase or (lambda name: None)
     print_header("Medical Information System")
 
     try:
-        # Doctor Types
-        print_header("Doctor Types")
-        result = get_all_doctor_types()
-        if result:
-            print(format_doctor_types(result))
-            print_success("Successfully retrieved doctor types")
-        else:
-            print_error("Failed to retrieve doctor types")
-
-        # Doctors
-        print_header("Doctors")
-        result = get_all_doctors()
-        if result:
-            print(format_doctors(result))
-            print_success("Successfully retrieved doctors")
-        else:
-            print_error("Failed to retrieve doctors")
-
-        # Customers
-        print_header("Customers")
-        result = get_all_customers()
-        if result:
-            print(format_customers(result))
-            print_success("Successfully retrieved customers")
-        else:
-            print_error("Failed to retrieve customers")
-
-        # Clinics
-        print_header("Clinics")
-        result = get_all_clinics()
-        if result:
-            print(format_clinics(result))
-            print_success("Successfully retrieved clinics")
-
-            # Получаем кабинеты для каждой клиники
-            if 'searchClinic' in result and 'elems' in result['searchClinic']:
-                for clinic in result['searchClinic']['elems']:
-                    clinic_id = clinic.get('id')
-                    if clinic_id:
-                        print_header(f"Offices for clinic: { clinic.get('name', 'Unknown')} ")
-                        offices_result = get_clinic_offices(clinic_id)
-                        if offices_result:
-                            print(format_clinic_offices(offices_result))
-                            print_success("Successfully retrieved clinic offices")
-                        else:
-                            print_error("Failed to retrieve clinic offices")
+        on_phase("crawling")
+        # Собираем все данные один раз, затем выводим отчет и сохраняем в JSON из памяти.
+        # В инкрементальном режиме дополняем прошлый results.json только изменениями с сервера
+        if incremental:
+            all_data = delta_sync.sync_data("results.json", on_error=print_error)
         else:
+            # Полный обход тоже отмечает водяные знаки, от которых пойдет следующая инкрементальная синхронизация
+            all_data = delta_sync.stamp(async_crawler.collect_all_data(on_error=print_error))
+        if not all_data["clinics"]:
             print_error("Failed to retrieve clinics")
+            return
+
+        print_report(all_data)
+        print_success("Successfully retrieved data")
+
+        print_header("Saving data to JSON")
+        on_phase("saving")
+        filename = f"results.json"
+        # Снимок сохраняется в нормализованном формате: врачи, кабинеты и клиенты записей хранятся один раз
+        save_snapshot(all_data, filename)
+
+        # Дополнительно сохраняем снимок в SQLite с индексами для быстрых выборок
+        if sqlite_file:
+            get_store(sqlite_file).save_snapshot(all_data)
+            print_success(f"Data successfully saved to {sqlite_file}")
 
-        # Для каждой клиники получаем информацию о врачах и их расписании
-        print_header("Doctors Schedule")
-        clinics_result = get_all_clinics()
-        if clinics_result and 'searchClinic' in clinics_result and 'elems' in clinics_result['searchClinic']:
-            for clinic in clinics_result['searchClinic']['elems']:
-                clinic_id = clinic.get('id')
-                if clinic_id:
-                    print_header(f"Doctors in clinic: {clinic.get('name', 'Unknown')} (ID: {clinic_id})")
-
-                    # Получаем врачей клиники
-                    doctors_result = get_clinic_doctors(clinic_id)
-                    if doctors_result:
-                        formatted_output = format_clinic_doctors(doctors_result)
-                        if formatted_output:
-                            print(formatted_output)
-                            print_success("Successfully retrieved clinic doctors")
-                        else:
-                            print_info("No doctors found for this clinic")
-                    else:
-                        print_error("Failed to retrieve clinic doctors")
-
-                        # Если есть врачи, получаем их расписание
-                        if doctors_result and 'searchClinicDoctor' in doctors_result and 'elems' in doctors_result[
-                            'searchClinicDoctor']:
-                            for clinic_doctor in doctors_result['searchClinicDoctor']['elems']:
-                                clinic_doctor_id = clinic_doctor.get('id')
-                                doctor = clinic_doctor.get('doctor', {}).get('entity', {})
-                                person = doctor.get('person', {}).get('entity', {})
-                                doctor_name = f"{person.get('firstName', '')} {person.get('lastName', '')}"
-
-                                print_header(f"Schedule for doctor: {doctor_name}")
-                                availability_result = get_doctor_availability(clinic_doctor_id)
-                                if availability_result:
-                                    print(format_doctor_availability(availability_result))
-                                    print_success("Successfully retrieved doctor's schedule")
-                                else:
-                                    print_error("Failed to retrieve doctor's schedule")
-
-
-        # Получаем список клиник
-        clinics_result = get_all_clinics()
-        if clinics_result and 'searchClinic' in clinics_result and 'elems' in clinics_result['searchClinic']:
-            for clinic in clinics_result['searchClinic']['elems']:
-                clinic_id = clinic.get('id')
-                if clinic_id:
-                    print_header(f"Appointments in clinic: {clinic.get('name', 'Unknown')}")
-
-                    # Получаем записи к врачам для данной клиники
-                    appointments_result = get_clinic_tables(clinic_id)
-                    if appointments_result:
-                        formatted_output = format_clinic_tables(appointments_result)
-                        if formatted_output:
-                            print(formatted_output)
-                            print_success("Successfully retrieved appointments")
-                        else:
-                            print_info("No appointments found for this clinic")
-                    else:
-                        print_error("Failed to retrieve appointments")
-
-
-            # Собираем все данные и сохраняем в JSON
-            print_header("Saving data to JSON")
-            all_data = collect_all_data()
-
-            filename = f"results.json"
-            save_to_json(all_data, filename)
+        # И снимок по разделам: потребители разбирают только нужные им разделы,
+        # а воркеры веб-приложения подхватывают новое поколение файла
+        if sections_file:
+            generation = shared_snapshot.publish(all_data, sections_file)
+            print_success(f"Data successfully saved to {sections_file} (generation {generation})")
 
+        return all_data
 
     except Exception as e:
         print_error(f"An error occurred: {str(e)}")
         import traceback
         print_error(traceback.format_exc())
 
-    print_header("End of Report")
+    finally:
+        print_header("End of Report")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(incremental="--incremental" in sys.argv,
+         sqlite_file="results.db" if "--sqlite" in sys.argv else None,
+         sections_file="results.snap" if "--sections" in sys.argv else None)
\ No newline at end of file
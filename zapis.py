@@ -1,36 +1,9 @@
-import requests
+from graphql_client import graphql_query
 import json
 
-# Добавить цикл для постоянного обновления данных
 # Соеденить с моделью
 
 
-# URL GraphQL сервера
-url = "https://smapi.pv-api.sbc.space/ds-7429590172239724545/graphql"
-
-def graphql_query(query, variables=None):
-    try:
-        json_data = {
-            'query': query,
-            'variables': variables or {}
-        }
-
-        response = requests.post(url, json=json_data)
-
-        if response.status_code == 200:
-            result = response.json()
-            if 'errors' in result:
-                print(f"GraphQL Errors: {result['errors']}")
-                return None
-            return result.get('data')
-        else:
-            print(f"HTTP Error {response.status_code}: {response.text}")
-            return None
-
-    except Exception as e:
-        print(f"Exception occurred: {str(e)}")
-        return None
-
 def create_person(first_name, last_name, inn, birth_date):
     mutation = """
     mutation createPerson($input: _CreatePersonInput!) {